@@ -3,24 +3,43 @@
 实现每日自动化处理:优先级评估 -> 深度分析 -> Notion推送
 """
 import argparse
+import atexit
+import functools
+import hashlib
+import itertools
 import logging
+import re
 import sys
-import time
 import queue
 import threading
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional, Tuple
 
 from src.config import config
 from src.database import DatabaseManager
 from src.source_reader import SourceReader
 from src.llm_processor import LLMProcessor
 from src.notion_client import NotionClient
+from src.rate_limiter import AdaptiveLimiter, TokenBucket
+
+# 图片markdown标记: ![alt](URL),使用否定字符类避免回溯
+_IMG_MD_RE = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+# 无实质文字的内容:只包含链接、表情、标点或空白
+_TRIVIAL_CONTENT_RE = re.compile(r'(?:https?://\S+|[\W_])*')
+# 第一阶段每累积这么多条分析记录就写库一次
+_PRIORITY_SAVE_BATCH_SIZE = 100
+# 流水线预热时间:深度分析线程最多等待第一阶段这么久,超时后按当时已有的最高分开始取用(近似Top N)
+_PIPELINE_WARMUP_SECONDS = 30
 
 
 def setup_logging():
-    """设置日志系统"""
+    """设置日志系统
+
+    业务线程只把日志记录放入队列,由单独的监听线程写入文件和控制台,
+    避免并发工作线程在文件写入上互相阻塞
+    """
     log_config = config.get_logging_config()
 
     # 创建logs目录
@@ -30,14 +49,28 @@ def setup_logging():
         os.makedirs(log_dir)
 
     # 配置日志格式
-    logging.basicConfig(
-        level=getattr(logging, log_config['log_level']),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_config['log_file'], encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
-        ]
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    file_handler = RotatingFileHandler(
+        log_config['log_file'],
+        maxBytes=log_config['max_bytes'],
+        backupCount=log_config['backup_count'],
+        encoding='utf-8'
     )
+    stream_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    # 进程退出前停止监听线程,确保队列中剩余日志全部写出
+    atexit.register(listener.stop)
+
+    # QueueHandler不设置格式,由监听线程中的handler统一格式化
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, log_config['log_level']))
+    root_logger.addHandler(QueueHandler(log_queue))
 
     logger = logging.getLogger(__name__)
     logger.info("=" * 60)
@@ -46,8 +79,169 @@ def setup_logging():
     return logger
 
 
+def _priority_record(post: Dict[str, Any], priority_analysis: Dict[str, Any],
+                     final_score: int, is_worth: bool) -> Dict[str, Any]:
+    """构造待批量写入数据库的优先级分析记录"""
+    return {
+        'source_platform': post['source_platform'],
+        'source_post_id': post['source_post_id'],
+        'original_content': post.get('original_content'),
+        'cleaned_content': post['cleaned_content'],
+        'content_sha1': post['content_sha1'],
+        'original_url': post.get('original_url'),
+        'author_name': post.get('author_name'),
+        'priority_analysis': priority_analysis,
+        'priority_analysis_json': priority_analysis.get('priority_analysis_json'),
+        'final_priority_score': final_score,
+        'is_worth_processing': is_worth
+    }
+
+
+def _has_media(post: Dict[str, Any]) -> bool:
+    """帖子是否带图片:有VLM解读、媒体链接或原文中的图片标记"""
+    media_urls = post.get('media_urls')
+    return bool(post.get('interpretation')
+                or (media_urls and media_urls not in ('[]', 'null'))
+                or _IMG_MD_RE.search(post.get('original_content') or ''))
+
+
+def _priority_skip_reason(post: Dict[str, Any], *, min_content_length: int) -> Optional[str]:
+    """判断帖子能否不调用LLM直接记0分,返回跳过原因,不能跳过返回None
+
+    不带图片,且正文短于 min_content_length 或只有链接/表情/标点的帖子跳过
+    (带图片的帖子价值可能在图片和VLM解读中,不按正文判断;min_content_length 为0时不跳过)
+    """
+    cleaned_content = post['cleaned_content']
+    if min_content_length <= 0 or _has_media(post):
+        return None
+    if len(cleaned_content) < min_content_length or _TRIVIAL_CONTENT_RE.fullmatch(cleaned_content):
+        return 'trivial_content'
+    return None
+
+
+def _analyze_priority(post: Dict[str, Any], priority_result: Dict[str, Any], *,
+                      llm_processor: LLMProcessor, threshold: int,
+                      logger: logging.Logger) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """根据单个帖子的优先级分析结果计分,返回 (待保存的分析记录, 高价值帖子或None),失败返回None
+
+    Args:
+        post: 已清理内容并计算哈希的帖子
+        priority_result: Fast LLM的分析结果(Batch API或实时调用)
+    """
+    try:
+        post_id = post['source_post_id']
+        platform = post['source_platform']
+
+        if not priority_result.get('success'):
+            logger.error(f"优先级分析失败: {priority_result.get('error')}")
+            return None
+
+        # 计算最终分数 - 使用去除图片markdown后的内容长度
+        cleaned_content = post['cleaned_content']
+        final_score = llm_processor.calculate_priority_score(priority_result, len(cleaned_content))
+
+        # 判断是否值得处理
+        is_worth = final_score >= threshold
+
+        logger.info(f"帖子 {platform}/{post_id} - 分数: {final_score}, 值得处理: {is_worth}")
+
+        # 待批量保存到数据库的记录
+        post_data = _priority_record(post, priority_result, final_score, is_worth)
+
+        high_value_post = None
+        if is_worth:
+            high_value_post = {
+                'source_platform': platform,
+                'source_post_id': post_id,
+                'original_content': post.get('original_content'),
+                'cleaned_content': cleaned_content,
+                'original_url': post.get('original_url'),
+                'author_name': post.get('author_name'),
+                'final_priority_score': final_score,
+                'has_image': priority_result.get('has_image', False),
+                'interpretation': post.get('interpretation')  # VLM解读内容
+            }
+
+        return post_data, high_value_post
+
+    except Exception as e:
+        logger.error(f"处理帖子时出错: {e}")
+        return None
+
+
+def _analyze_depth(post: Dict[str, Any], *, llm_processor: LLMProcessor, rate_limiter: TokenBucket,
+                   limiter: AdaptiveLimiter, retry_delay: float,
+                   logger: logging.Logger) -> Optional[Dict[str, Any]]:
+    """深度分析单个帖子,返回报告(含更新数据库所需的字段),失败返回None
+
+    limiter 在所有工作线程间共享:Smart Model 持续429/5xx时自动降低并发并熔断
+    """
+    try:
+        post_id = post['source_post_id']
+        platform = post['source_platform']
+
+        logger.info(f"深度分析帖子: {platform}/{post_id}")
+
+        # 构建分析内容:如果有图片且有VLM解读,则组合原文+解读
+        has_image = post.get('has_image', False)
+        interpretation = post.get('interpretation')
+        original_content = post['original_content']
+
+        # 去除原文中的图片markdown标记,避免干扰模型(优先复用第一阶段的清理结果)
+        cleaned_content = post.get('cleaned_content') or _IMG_MD_RE.sub('', original_content).strip()
+
+        if has_image and interpretation:
+            # 有图片:组合清理后的原文和VLM解读
+            analysis_content = f"""[原始帖子内容]
+{cleaned_content}
+
+[图片视觉解读]
+{interpretation}
+"""
+            logger.info(f"帖子包含图片,已附加VLM解读 (解读长度: {len(interpretation)} 字符)")
+        else:
+            # 无图片:只用清理后的原文
+            analysis_content = cleaned_content
+            logger.info("帖子不含图片,仅使用原文内容")
+
+        # 运行Smart Model深度分析
+        limiter.acquire()
+        try:
+            rate_limiter.acquire()
+            depth_result = llm_processor.run_depth_analysis(analysis_content, retry_delay=retry_delay)
+        finally:
+            limiter.release()
+
+        if not depth_result.get('success'):
+            limiter.on_failure(depth_result.get('status_code'))
+            logger.error(f"深度分析失败: {depth_result.get('error')}")
+            return None
+
+        limiter.on_success()
+
+        logger.info(f"帖子 {platform}/{post_id} 深度分析完成,使用模型: {depth_result['model']}")
+
+        return {
+            'source_platform': platform,
+            'source_post_id': post_id,
+            'original_content': post.get('original_content'),
+            'original_url': post.get('original_url'),
+            'author_name': post.get('author_name'),
+            'final_priority_score': post.get('final_priority_score', 0),
+            'analysis_report': depth_result['report'],
+            'analysis_report_json': depth_result.get('report_json'),
+            'model_used': depth_result['model']
+        }
+
+    except Exception as e:
+        logger.error(f"深度分析帖子时出错: {e}", exc_info=True)
+        return None
+
+
 def process_priority_analysis_batch(posts: List[Dict[str, Any]], llm_processor: LLMProcessor,
-                                    db_manager: DatabaseManager, processing_config: Dict[str, int]) -> List[Dict[str, Any]]:
+                                    db_manager: DatabaseManager, processing_config: Dict[str, Any],
+                                    use_batch_api: bool = False,
+                                    on_high_value: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
     """第一阶段:批量进行优先级分析
 
     Args:
@@ -55,6 +249,8 @@ def process_priority_analysis_batch(posts: List[Dict[str, Any]], llm_processor:
         llm_processor: LLM处理器
         db_manager: 数据库管理器
         processing_config: 处理配置
+        use_batch_api: 是否先通过OpenAI Batch API提交,未得到结果的帖子再实时调用
+        on_high_value: 每得到一个高价值帖子立即回调,用于流水线式地交给下一阶段
 
     Returns:
         高价值帖子列表
@@ -65,92 +261,154 @@ def process_priority_analysis_batch(posts: List[Dict[str, Any]], llm_processor:
     logger.info(f"=" * 60)
 
     high_value_posts = []
+    priority_records = []
     threshold = processing_config['priority_threshold']
     fast_workers = processing_config['fast_llm_workers']
     fast_delay = processing_config['fast_llm_delay']
+    min_content_length = processing_config['min_content_length']
 
-    def analyze_single_post(post):
-        """分析单个帖子"""
-        try:
-            post_id = post['source_post_id']
-            platform = post['source_platform']
+    # 主动限速:每次调用API前获取令牌,fast_delay为两次请求的最小间隔
+    rate_limiter = TokenBucket.from_delay(fast_delay)
 
-            logger.info(f"分析帖子: {platform}/{post_id}")
+    save_stats = {'saved': 0, 'total': 0}
 
-            # 运行Fast LLM优先级分析
-            priority_result = llm_processor.run_priority_analysis(post['original_content'])
-
-            if not priority_result.get('success'):
-                logger.error(f"优先级分析失败: {priority_result.get('error')}")
-                return None
+    def flush_records():
+        """把已累积的分析记录写入数据库;边评估边分批保存,中途出错也不会丢失已付费的结果
 
-            # 计算最终分数 - 使用去除图片markdown后的内容长度
-            import re
-            original_content = post.get('original_content', '')
-            cleaned_content = re.sub(r'!\[.*?\]\(.*?\)', '', original_content).strip()
-            content_length = len(cleaned_content)
-
-            final_score = llm_processor.calculate_priority_score(priority_result, content_length)
-
-            # 判断是否值得处理
-            is_worth = final_score >= threshold
-
-            logger.info(f"帖子 {platform}/{post_id} - 分数: {final_score}, 值得处理: {is_worth}")
+        实时调用时在 run_priority_analysis_many 的回调线程中执行,写库期间事件循环上的请求照常进行,
+        只有后续回调会等待写库完成
+        """
+        if not priority_records:
+            return
+        batch = priority_records[:]
+        priority_records.clear()
+        saved = db_manager.save_priority_analysis_bulk(batch)
+        save_stats['saved'] += saved
+        save_stats['total'] += len(batch)
+        if saved < len(batch):
+            logger.warning(f"{len(batch) - saved}/{len(batch)} 条优先级分析结果未能保存,这些帖子下次运行时将重新评估")
+
+    def add_record(post_data):
+        """累积一条待保存的分析记录,攒够一批即写库"""
+        priority_records.append(post_data)
+        if len(priority_records) >= _PRIORITY_SAVE_BATCH_SIZE:
+            flush_records()
+
+    # 清理图片标记;确定达不到阈值的帖子直接记0分,不调用LLM
+    candidate_posts = []
+    for post in posts:
+        post['cleaned_content'] = _IMG_MD_RE.sub('', post.get('original_content') or '').strip()
+        skip_reason = _priority_skip_reason(post, min_content_length=min_content_length)
+        if skip_reason:
+            # 不记录内容哈希,避免之后的同内容帖子复用这条跳过记录
+            post['content_sha1'] = None
+            add_record(_priority_record(post, {'skipped': skip_reason}, 0, False))
+            continue
 
-            # 保存到数据库
-            post_data = {
-                'source_platform': platform,
-                'source_post_id': post_id,
-                'original_content': post.get('original_content'),
-                'original_url': post.get('original_url'),
-                'author_name': post.get('author_name'),
-                'priority_analysis': priority_result,
-                'final_priority_score': final_score,
-                'is_worth_processing': is_worth
-            }
+        post['content_sha1'] = hashlib.sha1(post['cleaned_content'].encode('utf-8')).hexdigest()
+        candidate_posts.append(post)
 
-            db_manager.save_priority_analysis(post_data)
+    if len(candidate_posts) < len(posts):
+        logger.info(f"{len(posts) - len(candidate_posts)} 个帖子无实质内容,跳过LLM评估")
 
-            if is_worth:
-                return {
-                    'source_platform': platform,
-                    'source_post_id': post_id,
-                    'original_content': post.get('original_content'),
-                    'original_url': post.get('original_url'),
-                    'author_name': post.get('author_name'),
-                    'final_priority_score': final_score,
-                    'has_image': priority_result.get('has_image', False),
-                    'interpretation': post.get('interpretation')  # VLM解读内容
-                }
+    # 内容去重:相同正文(转发、跨平台重复发布)已评估过则直接复用历史结果,不再调用LLM
+    known_analyses = db_manager.lookup_priority_by_content_hashes(
+        list({post['content_sha1'] for post in candidate_posts})
+    )
+    pending_posts = []
+    # 本批内正文相同的帖子只评估第一个,其余复用它的结果: {content_sha1: [重复帖子]}
+    batch_duplicates = {}
+    for post in candidate_posts:
+        known = known_analyses.get(post['content_sha1'])
+        if not known:
+            if post['content_sha1'] in batch_duplicates:
+                batch_duplicates[post['content_sha1']].append(post)
+            else:
+                batch_duplicates[post['content_sha1']] = []
+                pending_posts.append(post)
+            continue
 
-            return None
+        # 复用历史分数,但不再标记为值得处理,避免同一内容重复深度分析和推送
+        add_record(
+            _priority_record(post, known['priority_analysis'], known['final_priority_score'], False)
+        )
 
-        except Exception as e:
-            logger.error(f"处理帖子时出错: {e}")
-            return None
+    duplicate_count = sum(len(duplicates) for duplicates in batch_duplicates.values())
+    if known_analyses:
+        logger.info(f"{len(candidate_posts) - len(pending_posts) - duplicate_count} 个帖子与已评估内容重复,复用历史结果")
+    if duplicate_count:
+        logger.info(f"{duplicate_count} 个帖子与本批其他帖子内容相同,只评估一次")
 
-    # 使用线程池并发处理
-    with ThreadPoolExecutor(max_workers=fast_workers) as executor:
-        futures = [executor.submit(analyze_single_post, post) for post in posts]
+    try:
+        # Batch API:整体提交一次,费用减半;超时或失败的帖子返回None,回退到实时调用
+        batch_results = [None] * len(pending_posts)
+        if use_batch_api and pending_posts:
+            batch_results = llm_processor.run_priority_analysis_batch(
+                pending_posts, max_wait=processing_config['batch_api_max_wait']
+            )
 
-        for future in as_completed(futures):
-            result = future.result()
-            if result:
-                high_value_posts.append(result)
+        analyze_one = functools.partial(_analyze_priority, llm_processor=llm_processor,
+                                        threshold=threshold, logger=logger)
+
+        def collect(post, priority_result):
+            """计分并收集结果;实时调用时在每个请求完成后立即执行(回调线程中依次执行,无需加锁)"""
+            result = analyze_one(post, priority_result)
+            if not result:
+                return
+
+            post_data, high_value_post = result
+            # 先把高价值帖子交给下一阶段,再记录结果:攒够一批时的写库不会推迟深度分析
+            if high_value_post:
+                high_value_posts.append(high_value_post)
+                if on_high_value:
+                    on_high_value(high_value_post)
+
+            add_record(post_data)
+            # 同内容帖子复用分数,与历史去重一致不再标记为值得处理
+            for duplicate in batch_duplicates.pop(post['content_sha1'], ()):
+                add_record(_priority_record(duplicate, post_data['priority_analysis'],
+                                            post_data['final_priority_score'], False))
+
+        realtime_posts = []
+        for post, batch_result in zip(pending_posts, batch_results):
+            if batch_result is None:
+                realtime_posts.append(post)
+            else:
+                collect(post, batch_result)
+
+        # 实时调用:asyncio并发请求,同时在途的请求数不超过 fast_workers
+        if realtime_posts:
+            llm_processor.run_priority_analysis_many(
+                [post['original_content'] for post in realtime_posts],
+                concurrency=fast_workers,
+                rate_limiter=rate_limiter,
+                on_result=lambda index, priority_result: collect(realtime_posts[index], priority_result)
+            )
+    finally:
+        # 剩余记录(包括出错前已得到的结果)写入数据库
+        flush_records()
 
-            # 添加延迟避免API限速
-            time.sleep(fast_delay)
+    if save_stats['saved'] < save_stats['total']:
+        logger.warning(f"优先级分析结果仅保存 {save_stats['saved']}/{save_stats['total']} 条")
 
     logger.info(f"第一阶段完成: {len(high_value_posts)}/{len(posts)} 个帖子值得深度处理")
     return high_value_posts
 
 
-def process_depth_analysis_batch(posts: List[Dict[str, Any]], llm_processor: LLMProcessor,
-                                 db_manager: DatabaseManager, processing_config: Dict[str, int]) -> List[Dict[str, Any]]:
-    """第二阶段:批量进行深度分析
+def process_analysis_pipeline(posts: List[Dict[str, Any]], llm_processor: LLMProcessor,
+                              db_manager: DatabaseManager, processing_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """第一、二阶段流水线:优先级评估与深度分析并行进行
+
+    第一阶段每得到一个高价值帖子就放入按分数排序的优先队列,深度分析线程
+    在预热结束后(第一阶段完成或等待 _PIPELINE_WARMUP_SECONDS 秒)按分数从高到低取用,
+    深度分析总数不超过Top N。
+
+    第一阶段在预热时间内完成时,选出的就是全部高价值帖子中分数最高的Top N;
+    超时后提前开始的选取是近似的:线程取用的是当时已评估帖子中的最高分,
+    达到Top N后才评估出的更高分帖子不再进入深度分析。
 
     Args:
-        posts: 高价值帖子列表
+        posts: 未处理的帖子列表
         llm_processor: LLM处理器
         db_manager: 数据库管理器
         processing_config: 处理配置
@@ -159,91 +417,73 @@ def process_depth_analysis_batch(posts: List[Dict[str, Any]], llm_processor: LLM
         完成深度分析的报告列表
     """
     logger = logging.getLogger(__name__)
-    logger.info(f"=" * 60)
-    logger.info(f"第二阶段:深度分析 (共 {len(posts)} 个帖子)")
-    logger.info(f"=" * 60)
 
     analyzed_reports = []
+    top_n = processing_config['top_n_posts']
     smart_workers = processing_config['smart_model_workers']
     smart_delay = processing_config['smart_model_delay']
     retry_delay = processing_config['smart_model_retry_delay']
 
-    def analyze_single_post(post):
-        """深度分析单个帖子"""
-        try:
-            post_id = post['source_post_id']
-            platform = post['source_platform']
-
-            logger.info(f"深度分析帖子: {platform}/{post_id}")
+    # 主动限速:每次调用API前获取令牌,smart_delay为两次请求的最小间隔
+    rate_limiter = TokenBucket.from_delay(smart_delay)
+
+    # 自适应并发:Smart Model持续过载时减半并发并熔断,恢复后逐步回升
+    limiter = AdaptiveLimiter(smart_workers, cooldown=retry_delay)
+    analyze_one = functools.partial(_analyze_depth, llm_processor=llm_processor, rate_limiter=rate_limiter,
+                                    limiter=limiter, retry_delay=retry_delay, logger=logger)
+
+    # 队列元素: (-分数, 序号, 帖子),序号保证同分时按入队顺序且不比较字典;不设上限,避免阻塞第一阶段
+    candidates = queue.PriorityQueue()
+    sequence = itertools.count()
+    warmed_up = threading.Event()
+    lock = threading.Lock()
+    counters = {'started': 0}
+
+    def enqueue(post):
+        """第一阶段回调(同一时间只在一个线程中调用,见 collect):高价值帖子入队"""
+        candidates.put((-post['final_priority_score'], next(sequence), post))
+
+    def depth_worker():
+        """深度分析线程:预热结束(第一阶段完成或超时)后按分数从高到低取帖子,直至达到Top N或队列结束"""
+        warmed_up.wait(_PIPELINE_WARMUP_SECONDS)
+        while True:
+            _, _, post = candidates.get()
+            if post is None:
+                return
+
+            with lock:
+                if counters['started'] >= top_n:
+                    return
+                counters['started'] += 1
+
+            report = analyze_one(post)
+            if report:
+                with lock:
+                    analyzed_reports.append(report)
+
+    worker_count = max(1, min(smart_workers, top_n))
+    with ThreadPoolExecutor(max_workers=worker_count) as executor:
+        workers = [executor.submit(depth_worker) for _ in range(worker_count)]
 
-            # 构建分析内容:如果有图片且有VLM解读,则组合原文+解读
-            has_image = post.get('has_image', False)
-            interpretation = post.get('interpretation')
-            original_content = post['original_content']
-
-            # 去除原文中的图片markdown标记,避免干扰模型
-            import re
-            cleaned_content = re.sub(r'!\[.*?\]\(.*?\)', '', original_content)
-            cleaned_content = cleaned_content.strip()
-
-            if has_image and interpretation:
-                # 有图片:组合清理后的原文和VLM解读
-                analysis_content = f"""[原始帖子内容]
-{cleaned_content}
-
-[图片视觉解读]
-{interpretation}
-"""
-                logger.info(f"帖子包含图片,已附加VLM解读 (解读长度: {len(interpretation)} 字符)")
-            else:
-                # 无图片:只用清理后的原文
-                analysis_content = cleaned_content
-                logger.info("帖子不含图片,仅使用原文内容")
-
-            # 运行Smart Model深度分析
-            depth_result = llm_processor.run_depth_analysis(analysis_content, retry_delay=retry_delay)
-
-            if not depth_result.get('success'):
-                logger.error(f"深度分析失败: {depth_result.get('error')}")
-                return None
-
-            # 更新数据库
-            db_manager.update_with_depth_analysis(
-                platform,
-                post_id,
-                depth_result['report'],
-                depth_result['model']
+        try:
+            high_value_posts = process_priority_analysis_batch(
+                posts, llm_processor, db_manager, processing_config, on_high_value=enqueue
             )
+        finally:
+            # 第一阶段结束(或异常):解除预热等待,并为每个线程放入一个排在最后的结束标记
+            warmed_up.set()
+            for _ in workers:
+                candidates.put((float('inf'), next(sequence), None))
 
-            logger.info(f"帖子 {platform}/{post_id} 深度分析完成,使用模型: {depth_result['model']}")
-
-            return {
-                'source_platform': platform,
-                'source_post_id': post_id,
-                'original_content': post.get('original_content'),
-                'original_url': post.get('original_url'),
-                'author_name': post.get('author_name'),
-                'analysis_report': depth_result['report'],
-                'model_used': depth_result['model']
-            }
-
-        except Exception as e:
-            logger.error(f"深度分析帖子时出错: {e}")
-            return None
-
-    # 使用线程池并发处理(数量较少以避免限速)
-    with ThreadPoolExecutor(max_workers=smart_workers) as executor:
-        futures = [executor.submit(analyze_single_post, post) for post in posts]
+        for future in as_completed(workers):
+            future.result()
 
-        for future in as_completed(futures):
-            result = future.result()
-            if result:
-                analyzed_reports.append(result)
+    logger.info(f"深度分析候选: {len(high_value_posts)} 个高价值帖子,最多分析Top {top_n}")
 
-            # 添加延迟避免API限速
-            time.sleep(smart_delay)
+    # 批量更新深度分析结果(报告中已包含更新所需的全部字段)
+    db_manager.update_with_depth_analysis_bulk(analyzed_reports)
 
-    logger.info(f"第二阶段完成: {len(analyzed_reports)}/{len(posts)} 个帖子深度分析成功")
+    logger.info(f"第二阶段完成: {len(analyzed_reports)}/{min(top_n, len(high_value_posts))} 个帖子深度分析成功")
     return analyzed_reports
 
 
@@ -274,14 +514,12 @@ def push_to_notion_batch(reports: List[Dict[str, Any]], notion_client: NotionCli
 
     success_count = 0
 
-    for i, report in enumerate(reports):
-        try:
-            logger.info(f"推送报告 {i+1}/{len(reports)}: {report['source_platform']}/{report['source_post_id']}")
-
-            # 格式化并推送报告
-            push_result = notion_client.format_and_push_report(report, daily_page_id)
-
-            if push_result.get('success'):
+    def on_pushed(i, push_result):
+        """每推送完成一个报告立即标记,避免中途失败后重复推送"""
+        nonlocal success_count
+        report = reports[i]
+        if push_result.get('success'):
+            try:
                 # 标记为已推送
                 db_manager.mark_as_pushed(
                     report['source_platform'],
@@ -290,14 +528,16 @@ def push_to_notion_batch(reports: List[Dict[str, Any]], notion_client: NotionCli
                 )
                 success_count += 1
                 logger.info(f"报告推送成功: {push_result['page_url']}")
-            else:
-                logger.error(f"报告推送失败: {push_result.get('error')}")
+            except Exception as e:
+                logger.error(f"标记报告已推送时出错: {e}")
+        else:
+            logger.error(f"报告推送失败: {push_result.get('error')}")
 
-            # 添加延迟避免API限速
-            time.sleep(0.5)
+    # 分数高的报告先提交,页面按创建完成的先后排列,大致为分数从高到低
+    reports = sorted(reports, key=lambda report: report.get('final_priority_score', 0), reverse=True)
 
-        except Exception as e:
-            logger.error(f"推送报告时出错: {e}")
+    # Notion客户端内部按API限速(约每秒3个请求)控制整体速率
+    notion_client.push_reports_concurrent(reports, daily_page_id, max_concurrency=3, on_result=on_pushed)
 
     logger.info(f"第三阶段完成: {success_count}/{len(reports)} 个报告推送成功")
     return success_count
@@ -318,7 +558,6 @@ def task_daily_learning(args):
 
         # 获取配置
         days_back = processing_config['days_back']
-        top_n = processing_config['top_n_posts']
 
         # 第一阶段:获取未处理的帖子并进行优先级评估
         logger.info(f"获取最近 {days_back} 天的未处理帖子...")
@@ -328,21 +567,8 @@ def task_daily_learning(args):
             logger.info("没有找到未处理的帖子")
             return
 
-        # 进行优先级分析
-        high_value_posts = process_priority_analysis_batch(all_posts, llm_processor, db_manager, processing_config)
-
-        if not high_value_posts:
-            logger.info("没有找到高价值帖子")
-            return
-
-        # 按分数排序,取Top N
-        high_value_posts.sort(key=lambda x: x.get('final_priority_score', 0), reverse=True)
-        top_posts = high_value_posts[:top_n]
-
-        logger.info(f"选取Top {len(top_posts)} 个帖子进行深度分析")
-
-        # 第二阶段:深度分析
-        analyzed_reports = process_depth_analysis_batch(top_posts, llm_processor, db_manager, processing_config)
+        # 优先级分析与深度分析流水线并行:高价值帖子一出现即进入深度分析队列
+        analyzed_reports = process_analysis_pipeline(all_posts, llm_processor, db_manager, processing_config)
 
         if not analyzed_reports:
             logger.info("没有成功完成深度分析的报告")
@@ -393,7 +619,10 @@ def task_fast_llm_analysis(args):
 
         # 进行优先级分析
         logger.info(f"开始Fast LLM优先级评估,共 {len(all_posts)} 个帖子")
-        high_value_posts = process_priority_analysis_batch(all_posts, llm_processor, db_manager, processing_config)
+        high_value_posts = process_priority_analysis_batch(
+            all_posts, llm_processor, db_manager, processing_config,
+            use_batch_api=processing_config['use_batch_api']
+        )
 
         # 打印统计
         logger.info("=" * 60)
@@ -455,12 +684,9 @@ def notion_push_worker(push_queue: queue.Queue, notion_client: NotionClient,
                 logger.error(f"报告推送失败: {push_result.get('error')}")
                 stats_dict['failed'] += 1
 
-            # 标记任务完成
+            # 标记任务完成(API限速由Notion客户端控制)
             push_queue.task_done()
 
-            # 添加延迟避免API限速
-            time.sleep(0.5)
-
         except queue.Empty:
             # 队列为空,继续等待
             continue
@@ -501,8 +727,13 @@ def task_smart_model_analysis(args):
         x_post_ids = [p['source_post_id'] for p in top_posts_data if p['source_platform'] == 'X']
         jike_post_ids = [p['source_post_id'] for p in top_posts_data if p['source_platform'] == 'Jike']
 
-        x_interpretations = source_reader.get_interpretation_by_post_ids('X', x_post_ids) if x_post_ids else {}
-        jike_interpretations = source_reader.get_interpretation_by_post_ids('Jike', jike_post_ids) if jike_post_ids else {}
+        # 两个平台位于不同数据库,并发查询,耗时取两者最大值
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            x_future = executor.submit(source_reader.get_interpretation_by_post_ids, 'X', x_post_ids) if x_post_ids else None
+            jike_future = executor.submit(source_reader.get_interpretation_by_post_ids, 'Jike', jike_post_ids) if jike_post_ids else None
+
+            x_interpretations = x_future.result() if x_future else {}
+            jike_interpretations = jike_future.result() if jike_future else {}
 
         logger.info(f"获取到 {len(x_interpretations)} 个X图片解读, {len(jike_interpretations)} 个即刻图片解读")
 
@@ -526,6 +757,7 @@ def task_smart_model_analysis(args):
                 'source_platform': platform,
                 'source_post_id': post_id,
                 'original_content': post['original_content'],
+                'cleaned_content': post.get('cleaned_content'),
                 'original_url': post.get('original_url'),
                 'author_name': post.get('author_name'),
                 'final_priority_score': post.get('final_priority_score', 0),
@@ -565,82 +797,45 @@ def task_smart_model_analysis(args):
         smart_delay = processing_config['smart_model_delay']
         retry_delay = processing_config['smart_model_retry_delay']
 
-        def analyze_and_queue_post(post):
-            """分析单个帖子并立即加入推送队列"""
-            try:
-                post_id = post['source_post_id']
-                platform = post['source_platform']
-
-                logger.info(f"深度分析帖子: {platform}/{post_id}")
-
-                # 构建分析内容
-                has_image = post.get('has_image', False)
-                interpretation = post.get('interpretation')
-                original_content = post['original_content']
+        # 主动限速:每次调用API前获取令牌,smart_delay为两次请求的最小间隔
+        rate_limiter = TokenBucket.from_delay(smart_delay)
 
-                # 去除原文中的图片markdown标记
-                import re
-                cleaned_content = re.sub(r'!\[.*?\]\(.*?\)', '', original_content)
-                cleaned_content = cleaned_content.strip()
+        # 自适应并发:Smart Model持续过载时减半并发并熔断,恢复后逐步回升
+        limiter = AdaptiveLimiter(smart_workers, cooldown=retry_delay)
+        analyze_one = functools.partial(_analyze_depth, llm_processor=llm_processor, rate_limiter=rate_limiter,
+                                        limiter=limiter, retry_delay=retry_delay, logger=logger)
 
-                if has_image and interpretation:
-                    analysis_content = f"""[原始帖子内容]
-{cleaned_content}
-
-[图片视觉解读]
-{interpretation}
-"""
-                    logger.info(f"帖子包含图片,已附加VLM解读 (解读长度: {len(interpretation)} 字符)")
-                else:
-                    analysis_content = cleaned_content
-                    logger.info("帖子不含图片,仅使用原文内容")
-
-                # 运行Smart Model深度分析
-                depth_result = llm_processor.run_depth_analysis(analysis_content, retry_delay=retry_delay)
-
-                if not depth_result.get('success'):
-                    logger.error(f"深度分析失败: {depth_result.get('error')}")
-                    return None
+        def analyze_and_queue_post(post):
+            """分析单个帖子,保存结果并立即加入推送队列"""
+            report = analyze_one(post)
+            if not report:
+                return None
 
-                # 更新数据库
+            try:
                 db_manager.update_with_depth_analysis(
-                    platform,
-                    post_id,
-                    depth_result['report'],
-                    depth_result['model']
+                    report['source_platform'],
+                    report['source_post_id'],
+                    report['analysis_report'],
+                    report['model_used'],
+                    analysis_report_json=report.get('analysis_report_json')
                 )
+            except Exception as e:
+                logger.error(f"保存深度分析结果时出错: {e}", exc_info=True)
+                return None
 
-                stats_dict['analyzed'] += 1
-                logger.info(f"帖子 {platform}/{post_id} 深度分析完成,使用模型: {depth_result['model']}")
-
-                # 立即将报告加入推送队列
-                report = {
-                    'source_platform': platform,
-                    'source_post_id': post_id,
-                    'original_content': post.get('original_content'),
-                    'original_url': post.get('original_url'),
-                    'author_name': post.get('author_name'),
-                    'analysis_report': depth_result['report'],
-                    'model_used': depth_result['model']
-                }
-
-                push_queue.put(report)
-                logger.info(f"报告已加入推送队列: {platform}/{post_id}")
+            stats_dict['analyzed'] += 1
 
-                return True
+            push_queue.put(report)
+            logger.info(f"报告已加入推送队列: {report['source_platform']}/{report['source_post_id']}")
 
-            except Exception as e:
-                logger.error(f"深度分析帖子时出错: {e}", exc_info=True)
-                return None
+            return True
 
-        # 使用线程池并发处理(数量较少以避免限速)
-        with ThreadPoolExecutor(max_workers=smart_workers) as executor:
+        # 使用线程池并发处理(数量较少以避免限速,且不超过帖子数)
+        with ThreadPoolExecutor(max_workers=max(1, min(smart_workers, len(top_posts)))) as executor:
             futures = [executor.submit(analyze_and_queue_post, post) for post in top_posts]
 
             for future in as_completed(futures):
-                result = future.result()
-                # 添加延迟避免API限速
-                time.sleep(smart_delay)
+                future.result()
 
         # 所有分析完成,发送退出信号给推送线程
         logger.info("所有分析任务完成,等待推送线程完成...")
@@ -0,0 +1,21 @@
+-- 源数据库索引: SourceReader 读取X/即刻帖子依赖的索引
+-- 源数据库不由本项目建表,需要在对应的源库上手动执行一次(MySQL 不支持 CREATE INDEX IF NOT EXISTS,
+-- 已存在同名索引时跳过对应语句即可)。SourceReader 首次查询时会检查这些索引,缺失时输出提示日志。
+
+-- ========== X 数据源库 ==========
+
+-- 帖子按 created_at 过滤并按 (created_at, id) 键集分页,索引同时带上关联 twitter_users 的列,
+-- 范围扫描按索引顺序读取,无需额外排序
+CREATE INDEX idx_created_id ON twitter_posts (created_at, id, user_table_id);
+
+-- LEFT JOIN post_insights pi ON pi.post_id = p.id AND pi.status = 'completed',
+-- 以及按帖子ID批量查询图片解读
+CREATE INDEX idx_post_status ON post_insights (post_id, status);
+
+-- ========== 即刻数据源库 ==========
+
+-- 帖子按 created_at 过滤并按 (created_at, id) 键集分页,索引同时带上关联 jk_profiles 的列
+CREATE INDEX idx_created_id ON jk_posts (created_at, id, profile_id);
+
+-- 按帖子ID批量查询图片解读: postprocessing.post_id IN (...) AND status = 'success'
+CREATE INDEX idx_post_status ON postprocessing (post_id, status);
@@ -21,7 +21,11 @@ class Config:
         except Exception:
             pass
 
-        self.config_parser = configparser.ConfigParser()
+        # 关闭插值:值只在读取时解析一次,之后的 get() 不会再抛出 InterpolationError
+        # (密码等值中的 % 也无需转义);为兼容按旧规则写成 %% 的值,见 _get_ini_value
+        self.config_parser = configparser.ConfigParser(interpolation=None)
+        # 配置值快照:进程运行期间环境变量与config.ini不会变化,解析一次即可
+        self._value_cache: Dict[tuple, Any] = {}
 
         # 兼容多种位置查找 config.ini
         possible_paths = [
@@ -36,9 +40,12 @@ class Config:
                 self.config_file = p
                 break
 
+        # 只有成功读取配置文件后才查询 config.ini
+        self._has_ini = False
         if self.config_file:
             try:
                 self.config_parser.read(self.config_file, encoding='utf-8')
+                self._has_ini = True
                 logger.info(f"已加载配置文件: {self.config_file}")
             except (configparser.Error, UnicodeDecodeError):
                 logger.warning("读取配置文件失败,跳过。")
@@ -46,7 +53,14 @@ class Config:
             logger.info("未发现配置文件,将仅使用环境变量与默认值。")
 
     def _get_config_value(self, section: str, key: str, env_var: str, default_value: Any, value_type=str) -> Any:
-        """按优先级获取配置值：环境变量 > config.ini > 默认值"""
+        """按优先级获取配置值：环境变量 > config.ini > 默认值(结果会被缓存)"""
+        cache_key = (section, key, env_var, default_value, value_type)
+        if cache_key not in self._value_cache:
+            self._value_cache[cache_key] = self._resolve_config_value(section, key, env_var, default_value, value_type)
+        return self._value_cache[cache_key]
+
+    def _resolve_config_value(self, section: str, key: str, env_var: str, default_value: Any, value_type=str) -> Any:
+        """实际解析配置值,不走缓存"""
         env_val = os.getenv(env_var)
         # 明确检查:如果环境变量存在且非空,才使用
         if env_val is not None and env_val.strip():
@@ -55,18 +69,47 @@ class Config:
             except (ValueError, TypeError):
                 return default_value
 
-        try:
-            if self.config_parser.has_section(section) and self.config_parser.has_option(section, key):
-                cfg_val = self.config_parser.get(section, key)
-                try:
-                    return value_type(cfg_val)
-                except (ValueError, TypeError):
-                    return default_value
-        except (configparser.Error, UnicodeDecodeError):
-            pass
+        cfg_val = self._get_ini_value(section, key)
+        if cfg_val is not None:
+            try:
+                return value_type(cfg_val)
+            except (ValueError, TypeError):
+                return default_value
 
         return default_value
 
+    def _get_ini_value(self, section: str, key: str):
+        """读取 config.ini 中的原始值,未加载配置文件或不存在该项时返回None"""
+        if self._has_ini and self.config_parser.has_option(section, key):
+            value = self.config_parser.get(section, key)
+            if '%%' in value:
+                # 旧版本按默认插值规则读取,% 需写成 %%;含 %% 的值仍按插值规则解析,已有配置无需修改
+                try:
+                    defaults = dict(self.config_parser.items(section))
+                    value = configparser.BasicInterpolation().before_get(
+                        self.config_parser, section, key, value, defaults)
+                except configparser.InterpolationError:
+                    pass
+            return value
+        return None
+
+    def _get_password(self, section: str, env_var: str):
+        """获取密码:环境变量 > config.ini(密码允许为空字符串,不做类型转换)"""
+        password = os.getenv(env_var)
+        if password is None:
+            password = self._get_ini_value(section, 'password')
+        return password
+
+    @staticmethod
+    def _parse_bool(raw_value: str) -> bool:
+        """将 true/false、1/0、yes/no、on/off 字符串解析为布尔值"""
+        value = str(raw_value).strip().lower()
+        if value in ('1', 'true', 'yes', 'on'):
+            return True
+        if value in ('0', 'false', 'no', 'off'):
+            return False
+        raise ValueError(f"无法解析的布尔值: {raw_value}")
+
     def _parse_model_list(self, raw_value: str) -> List[str]:
         """将逗号分隔的模型字符串解析为有序且去重的列表"""
         if not raw_value:
@@ -81,13 +124,7 @@ class Config:
 
     def get_database_config(self) -> Dict[str, Any]:
         """获取学习数据库配置（环境变量 > config.ini > 默认值）"""
-        password = os.getenv('LEARNING_DB_PASSWORD')
-        if password is None:
-            try:
-                if self.config_parser.has_section('database') and self.config_parser.has_option('database', 'password'):
-                    password = self.config_parser.get('database', 'password')
-            except (configparser.Error, UnicodeDecodeError):
-                pass
+        password = self._get_password('database', 'LEARNING_DB_PASSWORD')
 
         config = {
             'host': self._get_config_value('database', 'host', 'LEARNING_DB_HOST', None),
@@ -125,13 +162,7 @@ class Config:
 
     def get_source_x_config(self) -> Dict[str, Any]:
         """获取X数据源数据库配置"""
-        password = os.getenv('SOURCE_X_DB_PASSWORD')
-        if password is None:
-            try:
-                if self.config_parser.has_section('source_x') and self.config_parser.has_option('source_x', 'password'):
-                    password = self.config_parser.get('source_x', 'password')
-            except (configparser.Error, UnicodeDecodeError):
-                pass
+        password = self._get_password('source_x', 'SOURCE_X_DB_PASSWORD')
 
         config = {
             'host': self._get_config_value('source_x', 'host', 'SOURCE_X_DB_HOST', None),
@@ -168,13 +199,7 @@ class Config:
 
     def get_source_jike_config(self) -> Dict[str, Any]:
         """获取即刻数据源数据库配置"""
-        password = os.getenv('SOURCE_JIKE_DB_PASSWORD')
-        if password is None:
-            try:
-                if self.config_parser.has_section('source_jike') and self.config_parser.has_option('source_jike', 'password'):
-                    password = self.config_parser.get('source_jike', 'password')
-            except (configparser.Error, UnicodeDecodeError):
-                pass
+        password = self._get_password('source_jike', 'SOURCE_JIKE_DB_PASSWORD')
 
         config = {
             'host': self._get_config_value('source_jike', 'host', 'SOURCE_JIKE_DB_HOST', None),
@@ -227,26 +252,36 @@ class Config:
             'max_content_length': self._get_config_value('llm', 'max_content_length', 'LLM_MAX_CONTENT_LENGTH', 380000, int),
             'max_tokens': self._get_config_value('llm', 'max_tokens', 'LLM_MAX_TOKENS', 20000, int),
             'smart_model_max_tokens': self._get_config_value('llm', 'smart_model_max_tokens', 'LLM_SMART_MODEL_MAX_TOKENS', 16000, int),
+            'cache_enabled': self._get_config_value('llm', 'cache_enabled', 'LLM_CACHE_ENABLED', True, self._parse_bool),
+            'cache_dir': self._get_config_value('llm', 'cache_dir', 'LLM_CACHE_DIR', '.llm_cache'),
+            'cache_ttl': self._get_config_value('llm', 'cache_ttl', 'LLM_CACHE_TTL', 7 * 24 * 3600, int),
         }
 
     def get_notion_config(self) -> Dict[str, Any]:
         """获取Notion集成配置"""
         return {
             'integration_token': self._get_config_value('notion', 'integration_token', 'NOTION_INTEGRATION_TOKEN', None),
-            'parent_page_id': self._get_config_value('notion', 'parent_page_id', 'NOTION_PARENT_PAGE_ID', None)
+            'parent_page_id': self._get_config_value('notion', 'parent_page_id', 'NOTION_PARENT_PAGE_ID', None),
+            'page_cache_enabled': self._get_config_value('notion', 'page_cache_enabled', 'NOTION_PAGE_CACHE_ENABLED', True, self._parse_bool),
+            'page_cache_dir': self._get_config_value('notion', 'page_cache_dir', 'NOTION_PAGE_CACHE_DIR', '.notion_cache'),
+            'page_cache_ttl': self._get_config_value('notion', 'page_cache_ttl', 'NOTION_PAGE_CACHE_TTL', 30 * 24 * 3600, int)
         }
 
-    def get_processing_config(self) -> Dict[str, int]:
+    def get_processing_config(self) -> Dict[str, Any]:
         """获取处理任务配置"""
         return {
             'days_back': self._get_config_value('processing', 'days_back', 'PROCESSING_DAYS_BACK', 1, int),
             'priority_threshold': self._get_config_value('processing', 'priority_threshold', 'PROCESSING_PRIORITY_THRESHOLD', 40, int),
             'top_n_posts': self._get_config_value('processing', 'top_n_posts', 'PROCESSING_TOP_N_POSTS', 50, int),
+            # 不含图片/VLM解读且正文短于该字数(或只有链接、表情)的帖子不调用LLM直接记0分,0表示关闭
+            'min_content_length': self._get_config_value('processing', 'min_content_length', 'PROCESSING_MIN_CONTENT_LENGTH', 30, int),
             'fast_llm_workers': self._get_config_value('processing', 'fast_llm_workers', 'PROCESSING_FAST_LLM_WORKERS', 10, int),
             'fast_llm_delay': self._get_config_value('processing', 'fast_llm_delay', 'PROCESSING_FAST_LLM_DELAY', 0.5, float),
             'smart_model_workers': self._get_config_value('processing', 'smart_model_workers', 'PROCESSING_SMART_MODEL_WORKERS', 2, int),
             'smart_model_delay': self._get_config_value('processing', 'smart_model_delay', 'PROCESSING_SMART_MODEL_DELAY', 2.0, float),
             'smart_model_retry_delay': self._get_config_value('processing', 'smart_model_retry_delay', 'PROCESSING_SMART_MODEL_RETRY_DELAY', 10.0, float),
+            'use_batch_api': self._get_config_value('processing', 'use_batch_api', 'PROCESSING_USE_BATCH_API', False, self._parse_bool),
+            'batch_api_max_wait': self._get_config_value('processing', 'batch_api_max_wait', 'PROCESSING_BATCH_API_MAX_WAIT', 1200.0, float),
         }
 
     def get_logging_config(self) -> Dict[str, Any]:
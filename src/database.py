@@ -3,17 +3,116 @@ MySQL 数据库管理器
 用于管理学习数据库的processed_posts表
 """
 import logging
+import re
+import threading
+import orjson
 import pymysql
 from contextlib import contextmanager
-from typing import Any, Dict, List, Optional
+from dbutils.pooled_db import PooledDB
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# IN查询每批最多的ID数,避免超出 max_allowed_packet 和预处理语句的参数上限
+_IN_QUERY_CHUNK_SIZE = 1000
+# 已处理集合预热时加载的时间范围(天):源帖子读取通常只回看最近几天
+_SEEN_PRIME_DAYS = 30
+# 批量写入每批的行数:pymysql 会把一批 INSERT 参数合并成多行VALUES语句,批次过大容易超出包大小限制
+_BULK_WRITE_BATCH_SIZE = 500
+# 不限制返回行数时传给 LIMIT 的值(MySQL 文档推荐的 BIGINT UNSIGNED 最大值写法)
+_NO_LIMIT = 18446744073709551615
+# 从索引列定义 "(`col_a`, `col_b`)" 中提取列名
+_BACKTICK_NAME_RE = re.compile(r'`([^`]+)`')
+
+
+def dumps_json(value: Any) -> str:
+    """序列化JSON列的值(orjson 原生输出UTF-8,中文不转义)
+
+    需要解码为 str 再传给 pymysql:bytes 参数会以 _binary 字符集发送,MySQL 拒绝写入JSON列。
+    LLM处理器预先序列化分析结果时也使用此函数,写库时可直接使用其输出
+    """
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
 
 class DatabaseManager:
     """学习数据库管理器"""
 
+    # 固定不变的SQL语句。pymysql 只支持文本协议,没有服务端预处理语句(COM_STMT_PREPARE),
+    # 这里统一定义为类常量,每次调用直接复用
+    _CHECK_PROCESSED_SQL = """
+        SELECT 1 FROM processed_posts
+        WHERE source_platform = %s AND source_post_id = %s
+        LIMIT 1
+    """
+
+    _PRIORITY_INSERT_SQL = """
+        INSERT INTO processed_posts
+        (source_platform, source_post_id, original_content, cleaned_content, content_sha1, original_url,
+         author_name, priority_analysis, final_priority_score, is_worth_processing)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+
+    _PRIORITY_UPSERT_SQL = _PRIORITY_INSERT_SQL.rstrip() + """
+        ON DUPLICATE KEY UPDATE
+            cleaned_content = VALUES(cleaned_content),
+            content_sha1 = VALUES(content_sha1),
+            priority_analysis = VALUES(priority_analysis),
+            final_priority_score = VALUES(final_priority_score),
+            is_worth_processing = VALUES(is_worth_processing),
+            updated_at = NOW()
+    """
+
+    _DEPTH_UPDATE_SQL = """
+        UPDATE processed_posts
+        SET analysis_report = %s,
+            model_used = %s,
+            updated_at = NOW()
+        WHERE source_platform = %s AND source_post_id = %s
+    """
+
+    # {after_clause} 为可选的键集分页条件,与排序键一致,可直接沿 idx_worth_pending 索引扫描
+    _POSTS_FOR_DEPTH_SQL = """
+        SELECT id, source_platform, source_post_id, original_content, cleaned_content,
+               original_url, author_name, final_priority_score, created_at
+        FROM processed_posts
+        WHERE is_worth_processing = TRUE
+          AND has_report = 0
+          {after_clause}
+        ORDER BY final_priority_score DESC, created_at DESC, id DESC
+        LIMIT %s
+    """
+
+    _REPORTS_FOR_NOTION_SQL = """
+        SELECT id, source_platform, source_post_id, original_content,
+               original_url, author_name, analysis_report, model_used,
+               created_at
+        FROM processed_posts
+        WHERE has_report = 1
+          AND pushed_to_notion = FALSE
+        ORDER BY final_priority_score DESC, created_at DESC
+        LIMIT %s
+    """
+
+    _MARK_PUSHED_SQL = """
+        UPDATE processed_posts
+        SET pushed_to_notion = TRUE,
+            notion_page_url = %s,
+            updated_at = NOW()
+        WHERE source_platform = %s AND source_post_id = %s
+    """
+
+    # 一次扫描同时计算所有计数,避免多次往返
+    _STATISTICS_SQL = """
+        SELECT
+            COUNT(*),
+            COALESCE(SUM(is_worth_processing = TRUE), 0),
+            COALESCE(SUM(has_report), 0),
+            COALESCE(SUM(pushed_to_notion = TRUE), 0),
+            COALESCE(SUM(created_at >= CURDATE()), 0)
+        FROM processed_posts
+    """
+
     def __init__(self, config=None, auto_init=True):
         """初始化数据库管理器
 
@@ -28,15 +127,39 @@ class DatabaseManager:
         self.config = config
         self.db_config = config.get_database_config()
 
+        # 连接池在首次使用时创建,各工作线程复用已建立的连接,免去每次操作的TCP+TLS握手
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+        # 进程内已处理集合 {(platform, post_id)}:首次查询时从数据库预热,之后写入时同步更新
+        self._seen = set()
+        self._seen_primed = False
+        self._seen_lock = threading.Lock()
+
         if auto_init:
             self.init_database()
 
+    def _get_pool(self) -> PooledDB:
+        """获取连接池(线程安全的延迟初始化)"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = PooledDB(
+                        creator=pymysql,
+                        mincached=2,
+                        maxcached=8,
+                        maxconnections=16,
+                        blocking=True,
+                        **self.db_config
+                    )
+        return self._pool
+
     @contextmanager
     def get_connection(self):
-        """获取数据库连接上下文管理器"""
+        """获取数据库连接上下文管理器(close() 将连接归还连接池)"""
         conn = None
         try:
-            conn = pymysql.connect(**self.db_config)
+            conn = self._get_pool().connection()
             yield conn
         except Exception as e:
             if conn:
@@ -57,6 +180,20 @@ class DatabaseManager:
                 cursor.execute(self._get_processed_posts_table_sql())
                 logger.info("已创建或确认 processed_posts 表")
 
+                # 为旧表补充后续新增的列
+                self._ensure_column(cursor, 'cleaned_content',
+                                    "TEXT COMMENT '去除图片标记后的帖子内容' AFTER `original_content`")
+                self._ensure_column(cursor, 'content_sha1',
+                                    "CHAR(40) DEFAULT NULL COMMENT '清理后内容的SHA1,用于重复内容去重' AFTER `cleaned_content`")
+                self._ensure_index(cursor, 'idx_content_sha1', '(`content_sha1`)')
+                self._ensure_column(cursor, 'has_report',
+                                    "TINYINT(1) GENERATED ALWAYS AS (`analysis_report` IS NOT NULL) STORED "
+                                    "COMMENT '是否已有深度分析报告(生成列,便于索引)' AFTER `model_used`")
+                self._ensure_index(cursor, 'idx_worth_pending',
+                                   '(`is_worth_processing`, `has_report`, `final_priority_score`, `created_at`, `id`)')
+                self._ensure_index(cursor, 'idx_pending_notion',
+                                   '(`has_report`, `pushed_to_notion`, `final_priority_score`, `created_at`)')
+
                 conn.commit()
                 logger.info("数据库表初始化完成")
 
@@ -64,6 +201,41 @@ class DatabaseManager:
             logger.error(f"数据库初始化失败: {e}")
             raise
 
+    def _ensure_column(self, cursor, column: str, definition: str):
+        """如果 processed_posts 表缺少指定列则添加(兼容已存在的旧表)
+
+        Args:
+            cursor: 数据库游标
+            column: 列名
+            definition: 列定义SQL
+        """
+        cursor.execute("SHOW COLUMNS FROM processed_posts WHERE Field = %s", (column,))
+        if cursor.fetchone() is None:
+            cursor.execute(f"ALTER TABLE processed_posts ADD COLUMN `{column}` {definition}")
+            logger.info(f"已为 processed_posts 表添加列: {column}")
+
+    def _ensure_index(self, cursor, index_name: str, definition: str):
+        """如果 processed_posts 表缺少指定索引则添加,已有同名索引但列不一致时重建
+
+        Args:
+            cursor: 数据库游标
+            index_name: 索引名
+            definition: 索引列定义SQL,如 "(`col_a`, `col_b`)"
+        """
+        cursor.execute("""
+            SELECT COLUMN_NAME FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'processed_posts' AND INDEX_NAME = %s
+            ORDER BY SEQ_IN_INDEX
+        """, (index_name,))
+        existing_columns = [row[0] for row in cursor.fetchall()]
+        if not existing_columns:
+            cursor.execute(f"ALTER TABLE processed_posts ADD INDEX `{index_name}` {definition}")
+            logger.info(f"已为 processed_posts 表添加索引: {index_name}")
+        elif existing_columns != _BACKTICK_NAME_RE.findall(definition):
+            cursor.execute(f"ALTER TABLE processed_posts DROP INDEX `{index_name}`, "
+                           f"ADD INDEX `{index_name}` {definition}")
+            logger.info(f"已重建 processed_posts 表索引: {index_name} {definition}")
+
     def _get_processed_posts_table_sql(self) -> str:
         """获取创建 processed_posts 表的SQL"""
         return """
@@ -72,6 +244,8 @@ class DatabaseManager:
           `source_post_id` VARCHAR(255) NOT NULL COMMENT '源帖子ID',
           `source_platform` ENUM('X', 'Jike') NOT NULL COMMENT '来源平台',
           `original_content` TEXT COMMENT '原始帖子内容',
+          `cleaned_content` TEXT COMMENT '去除图片标记后的帖子内容',
+          `content_sha1` CHAR(40) DEFAULT NULL COMMENT '清理后内容的SHA1,用于重复内容去重',
           `original_url` VARCHAR(512) COMMENT '原始帖子URL',
           `author_name` VARCHAR(255) COMMENT '作者名称',
 
@@ -83,6 +257,7 @@ class DatabaseManager:
           -- 深度分析结果
           `analysis_report` JSON DEFAULT NULL COMMENT '来自Smart Model的完整JSON分析报告',
           `model_used` VARCHAR(255) COMMENT '使用的分析模型名称',
+          `has_report` TINYINT(1) GENERATED ALWAYS AS (`analysis_report` IS NOT NULL) STORED COMMENT '是否已有深度分析报告(生成列,便于索引)',
 
           -- 状态管理
           `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '记录创建时间',
@@ -93,10 +268,41 @@ class DatabaseManager:
           UNIQUE KEY `uniq_source` (`source_platform`, `source_post_id`),
           KEY `idx_created_at` (`created_at`),
           KEY `idx_is_worth_processing` (`is_worth_processing`),
-          KEY `idx_pushed_to_notion` (`pushed_to_notion`)
+          KEY `idx_pushed_to_notion` (`pushed_to_notion`),
+          KEY `idx_content_sha1` (`content_sha1`),
+          KEY `idx_worth_pending` (`is_worth_processing`, `has_report`, `final_priority_score`, `created_at`, `id`),
+          KEY `idx_pending_notion` (`has_report`, `pushed_to_notion`, `final_priority_score`, `created_at`)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='已处理的社交媒体帖子';
         """
 
+    def _prime_seen(self):
+        """从数据库加载最近的已处理帖子到进程内集合(只执行一次)"""
+        with self._seen_lock:
+            if self._seen_primed:
+                return
+            self._seen_primed = True
+
+            try:
+                with self.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT source_platform, source_post_id FROM processed_posts
+                        WHERE created_at >= NOW() - INTERVAL %s DAY
+                    """, (_SEEN_PRIME_DAYS,))
+                    self._seen.update(cursor.fetchall())
+                    logger.info(f"已加载 {len(self._seen)} 条最近已处理帖子记录")
+            except Exception as e:
+                logger.warning(f"预热已处理帖子集合失败,将直接查询数据库: {e}")
+
+    def preload_processed_posts(self):
+        """提前加载最近的已处理帖子集合,供调用方在等待其他I/O时并发预热"""
+        self._prime_seen()
+
+    def _mark_seen(self, keys):
+        """将已写入数据库的帖子加入进程内集合"""
+        with self._seen_lock:
+            self._seen.update(keys)
+
     def check_if_processed(self, source_platform: str, source_post_id: str) -> bool:
         """检查某个源帖子是否已被处理
 
@@ -107,25 +313,58 @@ class DatabaseManager:
         Returns:
             是否已处理
         """
+        self._prime_seen()
+        if (source_platform, source_post_id) in self._seen:
+            return True
+
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
 
-                sql = """
-                SELECT COUNT(*) FROM processed_posts
-                WHERE source_platform = %s AND source_post_id = %s
-                """
-
-                cursor.execute(sql, (source_platform, source_post_id))
-                count = cursor.fetchone()[0]
+                # 只需判断是否存在,命中唯一索引的第一行即可返回
+                cursor.execute(self._CHECK_PROCESSED_SQL, (source_platform, source_post_id))
+                processed = cursor.fetchone() is not None
 
-                return count > 0
+                if processed:
+                    self._mark_seen([(source_platform, source_post_id)])
+                return processed
 
         except Exception as e:
             logger.error(f"检查帖子是否已处理失败: {e}")
             return False
 
-    def get_processed_post_ids(self, source_platform: str, post_ids: List[str]) -> set:
+    def get_processed_post_ids_sql_fragment(self, source_platform: str, source_db_config: Dict[str, Any],
+                                            id_column: str = 'p.id') -> Optional[Tuple[str, tuple]]:
+        """源数据库与学习数据库位于同一MySQL实例时,返回排除已处理帖子的 NOT EXISTS 条件
+
+        源库查询直接跨库反连接 processed_posts,省去回传ID列表再查询一次学习库
+
+        Args:
+            source_platform: 来源平台 ('X' 或 'Jike')
+            source_db_config: 源数据库连接配置
+            id_column: 源查询中帖子ID列的表达式
+
+        Returns:
+            (以 AND 开头的SQL条件, 参数元组),不在同一实例时返回None
+        """
+        same_server = (
+            source_db_config.get('host') == self.db_config.get('host')
+            and source_db_config.get('port') == self.db_config.get('port')
+        )
+        database = self.db_config.get('database')
+        if not same_server or not database:
+            return None
+
+        # 源帖子ID可能是整数列,转成与 source_post_id 相同排序规则的字符串再比较,才能走唯一索引
+        sql = f"""
+                  AND NOT EXISTS (
+                      SELECT 1 FROM `{database.replace('`', '``')}`.processed_posts lp
+                      WHERE lp.source_platform = %s
+                        AND lp.source_post_id = CAST({id_column} AS CHAR) COLLATE utf8mb4_unicode_ci
+                  )"""
+        return sql, (source_platform,)
+
+    def get_processed_post_ids(self, source_platform: str, post_ids: List[str]) -> Set[str]:
         """批量检查哪些帖子ID已被处理(优化版,避免N+1查询)
 
         Args:
@@ -133,33 +372,101 @@ class DatabaseManager:
             post_ids: 帖子ID列表
 
         Returns:
-            已处理的帖子ID集合
+            已处理的帖子ID集合(set,调用方可直接用 in 做O(1)成员判断)
         """
         try:
             if not post_ids:
                 return set()
 
+            # 先查进程内集合,只有未命中的ID才查询数据库(预热范围之外的旧帖子仍能查到)
+            self._prime_seen()
+            processed_ids = {pid for pid in post_ids if (source_platform, pid) in self._seen}
+            unknown_ids = [pid for pid in post_ids if pid not in processed_ids]
+            if not unknown_ids:
+                return processed_ids
+
             with self.get_connection() as conn:
                 cursor = conn.cursor()
 
-                # 使用IN查询批量检查
-                placeholders = ','.join(['%s'] * len(post_ids))
-                sql = f"""
-                SELECT source_post_id FROM processed_posts
-                WHERE source_platform = %s AND source_post_id IN ({placeholders})
-                """
+                # 使用IN查询批量检查,ID过多时分批查询
+                found_ids = set()
+                for start in range(0, len(unknown_ids), _IN_QUERY_CHUNK_SIZE):
+                    chunk = unknown_ids[start:start + _IN_QUERY_CHUNK_SIZE]
+                    placeholders = ','.join(['%s'] * len(chunk))
+                    sql = f"""
+                    SELECT source_post_id FROM processed_posts
+                    WHERE source_platform = %s AND source_post_id IN ({placeholders})
+                    """
 
-                params = [source_platform] + post_ids
-                cursor.execute(sql, params)
+                    cursor.execute(sql, [source_platform] + chunk)
+                    found_ids.update(row[0] for row in cursor.fetchall())
+
+                self._mark_seen((source_platform, pid) for pid in found_ids)
 
                 # 返回已处理的ID集合
-                processed_ids = {row[0] for row in cursor.fetchall()}
-                return processed_ids
+                return processed_ids | found_ids
 
         except Exception as e:
             logger.error(f"批量检查帖子处理状态失败: {e}")
             return set()
 
+    def _priority_analysis_params(self, post_data: Dict[str, Any]) -> tuple:
+        """将帖子数据转换为UPSERT SQL参数"""
+        return (
+            post_data['source_platform'],
+            post_data['source_post_id'],
+            post_data.get('original_content'),
+            post_data.get('cleaned_content'),
+            post_data.get('content_sha1'),
+            post_data.get('original_url'),
+            post_data.get('author_name'),
+            post_data.get('priority_analysis_json') or dumps_json(post_data.get('priority_analysis', {})),
+            post_data.get('final_priority_score', 0),
+            post_data.get('is_worth_processing', False)
+        )
+
+    def lookup_priority_by_content_hashes(self, content_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """按内容哈希批量查询已有的优先级分析结果
+
+        Args:
+            content_hashes: 清理后内容的SHA1列表
+
+        Returns:
+            字典: {content_sha1: {'priority_analysis': dict, 'final_priority_score': int}}
+        """
+        if not content_hashes:
+            return {}
+
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+
+                known = {}
+                # 分块查询,避免哈希过多时IN列表过长
+                for start in range(0, len(content_hashes), _IN_QUERY_CHUNK_SIZE):
+                    chunk = content_hashes[start:start + _IN_QUERY_CHUNK_SIZE]
+                    placeholders = ','.join(['%s'] * len(chunk))
+                    sql = f"""
+                    SELECT content_sha1, priority_analysis, final_priority_score
+                    FROM processed_posts
+                    WHERE content_sha1 IN ({placeholders})
+                      AND priority_analysis IS NOT NULL
+                    """
+
+                    cursor.execute(sql, chunk)
+
+                    for content_sha1, priority_analysis, final_priority_score in cursor.fetchall():
+                        if content_sha1 not in known:
+                            known[content_sha1] = {
+                                'priority_analysis': orjson.loads(priority_analysis),
+                                'final_priority_score': final_priority_score
+                            }
+                return known
+
+        except Exception as e:
+            logger.error(f"按内容哈希查询优先级分析结果失败: {e}")
+            return {}
+
     def save_priority_analysis(self, post_data: Dict[str, Any]) -> bool:
         """保存第一阶段Fast LLM的优先级分析结果
 
@@ -168,9 +475,12 @@ class DatabaseManager:
                 - source_platform: 来源平台
                 - source_post_id: 源帖子ID
                 - original_content: 原始内容
+                - cleaned_content: 去除图片标记后的内容 (可选)
+                - content_sha1: 清理后内容的SHA1 (可选)
                 - original_url: 原始URL (可选)
                 - author_name: 作者名称 (可选)
                 - priority_analysis: 优先级分析JSON
+                - priority_analysis_json: 已序列化的优先级分析JSON文本 (可选,提供时直接写入)
                 - final_priority_score: 最终优先级分数
                 - is_worth_processing: 是否值得处理
 
@@ -180,40 +490,54 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-
-                import json
-                sql = """
-                INSERT INTO processed_posts
-                (source_platform, source_post_id, original_content, original_url, author_name,
-                 priority_analysis, final_priority_score, is_worth_processing)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    priority_analysis = VALUES(priority_analysis),
-                    final_priority_score = VALUES(final_priority_score),
-                    is_worth_processing = VALUES(is_worth_processing),
-                    updated_at = NOW()
-                """
-
-                cursor.execute(sql, (
-                    post_data['source_platform'],
-                    post_data['source_post_id'],
-                    post_data.get('original_content'),
-                    post_data.get('original_url'),
-                    post_data.get('author_name'),
-                    json.dumps(post_data.get('priority_analysis', {}), ensure_ascii=False),
-                    post_data.get('final_priority_score', 0),
-                    post_data.get('is_worth_processing', False)
-                ))
+                cursor.execute(self._PRIORITY_UPSERT_SQL, self._priority_analysis_params(post_data))
 
                 conn.commit()
+                self._mark_seen([(post_data['source_platform'], post_data['source_post_id'])])
                 return cursor.rowcount > 0
 
         except Exception as e:
             logger.error(f"保存优先级分析结果失败: {e}")
             return False
 
+    def save_priority_analysis_bulk(self, records: List[Dict[str, Any]]) -> int:
+        """批量保存优先级分析结果,一次executemany代替逐条写入
+
+        Args:
+            records: 帖子数据列表,字段同 save_priority_analysis
+
+        Returns:
+            成功写入的记录数;批量写入失败时改为逐条写入,返回其中成功的条数
+        """
+        if not records:
+            return 0
+
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                sql = self._PRIORITY_UPSERT_SQL
+                params = [self._priority_analysis_params(record) for record in records]
+
+                # 连接默认 autocommit,显式开启事务,使所有批次只在最后提交(刷盘)一次
+                conn.begin()
+                for start in range(0, len(params), _BULK_WRITE_BATCH_SIZE):
+                    cursor.executemany(sql, params[start:start + _BULK_WRITE_BATCH_SIZE])
+
+                conn.commit()
+                self._mark_seen((record['source_platform'], record['source_post_id']) for record in records)
+                logger.info(f"批量保存 {len(records)} 条优先级分析结果")
+                return len(records)
+
+        except Exception as e:
+            # 整批回滚,逐条重试,避免一条坏数据或一次断连丢掉整批结果
+            logger.error(f"批量保存优先级分析结果失败,改为逐条保存: {e}")
+            saved = sum(1 for record in records if self.save_priority_analysis(record))
+            logger.info(f"逐条保存 {saved}/{len(records)} 条优先级分析结果")
+            return saved
+
     def update_with_depth_analysis(self, source_platform: str, source_post_id: str,
-                                   analysis_report: Dict[str, Any], model_used: str) -> bool:
+                                   analysis_report: Dict[str, Any], model_used: str,
+                                   analysis_report_json: Optional[str] = None) -> bool:
         """更新第二阶段Smart Model的深度分析结果
 
         Args:
@@ -221,6 +545,7 @@ class DatabaseManager:
             source_post_id: 源帖子ID
             analysis_report: 深度分析报告JSON
             model_used: 使用的模型名称
+            analysis_report_json: 已序列化的报告JSON文本,提供时直接写入,不再重复序列化
 
         Returns:
             是否更新成功
@@ -228,18 +553,8 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-
-                import json
-                sql = """
-                UPDATE processed_posts
-                SET analysis_report = %s,
-                    model_used = %s,
-                    updated_at = NOW()
-                WHERE source_platform = %s AND source_post_id = %s
-                """
-
-                cursor.execute(sql, (
-                    json.dumps(analysis_report, ensure_ascii=False),
+                cursor.execute(self._DEPTH_UPDATE_SQL, (
+                    analysis_report_json or dumps_json(analysis_report),
                     model_used,
                     source_platform,
                     source_post_id
@@ -252,39 +567,117 @@ class DatabaseManager:
             logger.error(f"更新深度分析结果失败: {e}")
             return False
 
-    def get_posts_for_depth_analysis(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """获取需要进行深度分析的帖子列表
+    def update_with_depth_analysis_bulk(self, records: List[Dict[str, Any]]) -> int:
+        """批量更新深度分析结果
 
         Args:
-            limit: 最大返回数量
+            records: 记录列表,每条包含 source_platform, source_post_id, analysis_report, model_used,
+                     可选 analysis_report_json(已序列化的报告)
 
         Returns:
-            帖子信息列表
+            提交的记录数,失败返回0
         """
+        if not records:
+            return 0
+
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor(pymysql.cursors.DictCursor)
+                cursor = conn.cursor()
+                sql = self._DEPTH_UPDATE_SQL
+                params = [
+                    (
+                        record.get('analysis_report_json') or dumps_json(record['analysis_report']),
+                        record['model_used'],
+                        record['source_platform'],
+                        record['source_post_id']
+                    )
+                    for record in records
+                ]
+
+                conn.begin()
+                for start in range(0, len(params), _BULK_WRITE_BATCH_SIZE):
+                    cursor.executemany(sql, params[start:start + _BULK_WRITE_BATCH_SIZE])
+
+                conn.commit()
+                logger.info(f"批量更新 {len(records)} 条深度分析结果")
+                return len(records)
+
+        except Exception as e:
+            logger.error(f"批量更新深度分析结果失败: {e}")
+            return 0
+
+    @staticmethod
+    @contextmanager
+    def _streaming_cursor(conn):
+        """打开服务端游标(SSDictCursor),逐行从网络读取结果,不在客户端缓存整个结果集
+
+        退出时关闭游标,读完剩余行,保证连接归还连接池时处于干净状态
+        """
+        cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
 
-                sql = """
-                SELECT id, source_platform, source_post_id, original_content,
-                       original_url, author_name, final_priority_score
-                FROM processed_posts
-                WHERE is_worth_processing = TRUE
-                  AND analysis_report IS NULL
-                ORDER BY final_priority_score DESC, created_at DESC
-                LIMIT %s
-                """
+    def iter_posts_for_depth_analysis(self, limit: Optional[int] = None,
+                                      after: Optional[Tuple[int, datetime, int]] = None) -> Iterator[Dict[str, Any]]:
+        """流式遍历需要进行深度分析的帖子
 
-                cursor.execute(sql, (limit,))
-                posts = cursor.fetchall()
+        Args:
+            limit: 最大返回数量,为None时不限制
+            after: 键集分页游标 (final_priority_score, created_at, id),取上一页最后一行的值,
+                   只返回排在其后的帖子;为None时从头开始
 
-                logger.info(f"获取到 {len(posts)} 个待深度分析的帖子")
-                return posts
+        Yields:
+            帖子信息字典
+        """
+        if after is None:
+            sql = self._POSTS_FOR_DEPTH_SQL.format(after_clause='')
+            params = ()
+        else:
+            sql = self._POSTS_FOR_DEPTH_SQL.format(
+                after_clause='AND (final_priority_score, created_at, id) < (%s, %s, %s)'
+            )
+            params = tuple(after)
+
+        with self.get_connection() as conn, self._streaming_cursor(conn) as cursor:
+            cursor.execute(sql, (*params, _NO_LIMIT if limit is None else limit))
+            yield from cursor
+
+    def get_posts_for_depth_analysis(self, limit: int = 100,
+                                     after: Optional[Tuple[int, datetime, int]] = None) -> List[Dict[str, Any]]:
+        """获取需要进行深度分析的帖子列表
+
+        Args:
+            limit: 最大返回数量
+            after: 键集分页游标 (final_priority_score, created_at, id),取上一页最后一行的值,
+                   只返回排在其后的帖子;为None时从头开始
+
+        Returns:
+            帖子信息列表
+        """
+        try:
+            posts = list(self.iter_posts_for_depth_analysis(limit, after))
+            logger.info(f"获取到 {len(posts)} 个待深度分析的帖子")
+            return posts
 
         except Exception as e:
             logger.error(f"获取待深度分析帖子失败: {e}")
             return []
 
+    def iter_reports_for_notion_push(self, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """流式遍历已完成深度分析且尚未推送到Notion的报告
+
+        Args:
+            limit: 最大返回数量,为None时不限制
+
+        Yields:
+            报告字典
+        """
+        with self.get_connection() as conn, self._streaming_cursor(conn) as cursor:
+            cursor.execute(self._REPORTS_FOR_NOTION_SQL, (_NO_LIMIT if limit is None else limit,))
+            yield from cursor
+
     def get_reports_for_notion_push(self, limit: int = 100) -> List[Dict[str, Any]]:
         """获取已完成深度分析且尚未推送到Notion的报告
 
@@ -295,25 +688,9 @@ class DatabaseManager:
             报告列表
         """
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-                sql = """
-                SELECT id, source_platform, source_post_id, original_content,
-                       original_url, author_name, analysis_report, model_used,
-                       created_at
-                FROM processed_posts
-                WHERE analysis_report IS NOT NULL
-                  AND pushed_to_notion = FALSE
-                ORDER BY final_priority_score DESC, created_at DESC
-                LIMIT %s
-                """
-
-                cursor.execute(sql, (limit,))
-                reports = cursor.fetchall()
-
-                logger.info(f"获取到 {len(reports)} 个待推送到Notion的报告")
-                return reports
+            reports = list(self.iter_reports_for_notion_push(limit))
+            logger.info(f"获取到 {len(reports)} 个待推送到Notion的报告")
+            return reports
 
         except Exception as e:
             logger.error(f"获取待推送报告失败: {e}")
@@ -334,15 +711,7 @@ class DatabaseManager:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
 
-                sql = """
-                UPDATE processed_posts
-                SET pushed_to_notion = TRUE,
-                    notion_page_url = %s,
-                    updated_at = NOW()
-                WHERE source_platform = %s AND source_post_id = %s
-                """
-
-                cursor.execute(sql, (notion_page_url, source_platform, source_post_id))
+                cursor.execute(self._MARK_PUSHED_SQL, (notion_page_url, source_platform, source_post_id))
                 conn.commit()
 
                 return cursor.rowcount > 0
@@ -361,30 +730,17 @@ class DatabaseManager:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
 
-                stats = {}
-
-                # 总处理数
-                cursor.execute("SELECT COUNT(*) FROM processed_posts")
-                stats['total_processed'] = cursor.fetchone()[0]
-
-                # 值得处理的数量
-                cursor.execute("SELECT COUNT(*) FROM processed_posts WHERE is_worth_processing = TRUE")
-                stats['worth_processing'] = cursor.fetchone()[0]
-
-                # 已完成深度分析的数量
-                cursor.execute("SELECT COUNT(*) FROM processed_posts WHERE analysis_report IS NOT NULL")
-                stats['depth_analyzed'] = cursor.fetchone()[0]
-
-                # 已推送到Notion的数量
-                cursor.execute("SELECT COUNT(*) FROM processed_posts WHERE pushed_to_notion = TRUE")
-                stats['pushed_to_notion'] = cursor.fetchone()[0]
-
-                # 今日处理数
-                cursor.execute("""
-                    SELECT COUNT(*) FROM processed_posts
-                    WHERE DATE(created_at) = CURDATE()
-                """)
-                stats['today_processed'] = cursor.fetchone()[0]
+                cursor.execute(self._STATISTICS_SQL)
+                row = cursor.fetchone()
+
+                # SUM 返回 Decimal,统一转为 int
+                stats = {
+                    'total_processed': int(row[0]),
+                    'worth_processing': int(row[1]),
+                    'depth_analyzed': int(row[2]),
+                    'pushed_to_notion': int(row[3]),
+                    'today_processed': int(row[4])
+                }
 
                 return stats
 
@@ -2,15 +2,190 @@
 LLM处理模块
 实现优先级评估(Fast LLM)和深度分析(Smart Model)两阶段处理
 """
+import asyncio
+import hashlib
 import logging
 import json
 import time
 import re
-from typing import Dict, Any, Optional
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
+
+import diskcache
+import httpx
+import orjson
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+from .database import dumps_json
+from .rate_limiter import TokenBucket
 
 logger = logging.getLogger(__name__)
 
+_SYSTEM_PROMPT = '你是一个专业的内容分析师,擅长总结和提取关键信息。'
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# 换用下一个Smart Model也无法解决的错误类别(提示词/输出格式问题),遇到时不再尝试后续模型
+_TERMINAL_ERROR_CLASSES = frozenset({'missing_fields', 'invalid_json', 'empty'})
+
+# Batch任务的终止状态
+_BATCH_FINAL_STATUSES = frozenset({'completed', 'failed', 'expired', 'cancelled'})
+# 取消Batch任务后等待其进入 cancelled 状态(部分结果文件生成)的最长秒数
+_BATCH_CANCEL_WAIT = 60
+
+
+class _EmptyResponseError(ValueError):
+    """LLM返回了空内容"""
+
+
+def _classify_error(error: Exception) -> str:
+    """按异常类型划分LLM调用错误类别"""
+    if isinstance(error, openai.APITimeoutError):
+        return 'timeout'
+    if isinstance(error, openai.APIConnectionError):
+        return 'transport'
+    if isinstance(error, openai.RateLimitError):
+        return 'rate_limit'
+    if isinstance(error, openai.APIStatusError):
+        # 4xx 多与具体模型有关(模型不存在、上下文超长等),换模型仍可能成功
+        return 'server_5xx' if error.status_code >= 500 else 'client_error'
+    if isinstance(error, _EmptyResponseError):
+        return 'empty'
+    return 'transport'
+
+
+# 优先级评分规则:LLM属性分(总计70分)与内容类型分(总计15分)
+_ATTRIBUTE_WEIGHTS = (
+    ('has_unique_insight', 35),
+    ('is_inspirational', 20),
+    ('is_debatable', 10),
+    ('is_well_written', 5),
+)
+_CATEGORY_SCORES = {
+    '技术洞察': 15, '行业观察': 15, '个人感悟': 15,
+    '产品评论': 10, '教程指南': 10,
+    '新闻速递': 5, '生活分享': 5,
+}
+
+# JSON提取使用的正则,模块加载时编译一次
+_PRIORITY_JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+_JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*(\{.*\})\s*```', re.DOTALL)
+_NESTED_BRACES_RE = re.compile(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', re.DOTALL)
+_GREEDY_BRACES_RE = re.compile(r'\{.*\}', re.DOTALL)
+_CTRL_CHARS_RE = re.compile(r'[\x00-\x1f\x7f-\x9f]')
+
+# 提示词模板:固定的前缀/后缀在模块加载时构建一次,每次调用只拼接帖子内容
+_PRIORITY_PROMPT_PREFIX = """# 角色
+你是一名高效、精准的内容预处理器。你的任务是分析一篇社交媒体帖子,并以严格的JSON格式输出其元数据和属性。
+
+# 核心任务
+我将提供一篇社交媒体帖子。请完成以下三项分析:
+1. **分类**: 从给定列表中为帖子选择最合适的类别。
+2. **图片检测**: 判断帖子内容中是否包含图片链接(格式如 `![](URL)` 或 `![alt](URL)`)。
+3. **属性判断**: 判断帖子是否具备某些关键特质。
+
+# 约束条件
+* 对于所有的布尔类型判断,请使用 `1` 代表 `true`,使用 `0` 代表 `false`。
+
+# 输出格式 (严格遵循此JSON结构,不要有任何额外解释)
+{
+  "post_category": "<从'技术洞察', '行业观察', '产品评论', '个人感悟', '新闻速递', '生活分享', '教程指南', '其他'中选择一个>",
+  "has_image": <1 或 0>,
+  "attributes": {
+    "has_unique_insight": <1 或 0>,
+    "is_inspirational": <1 或 0>,
+    "is_well_written": <1 或 0>,
+    "is_debatable": <1 或 0>
+  }
+}
+
+[原文Post]如下:
+```
+"""
+_DEPTH_PROMPT_PREFIX = """# 1. 角色 (Role)
+
+你是一位顶级的演讲教练与内容策略顾问,擅长将复杂或零散的信息,通过深刻的洞察和精妙的语言技巧,重塑为具有强大影响力和传播力的内容。你的核心能力是"点石成金",而非简单复述。
+
+# 2. 核心任务 (Task)
+
+我将提供一个`[原文Post]`,它来自社交媒体。Post内容可能包含两部分:
+1. **原始帖子内容**: 用户发布的文字
+2. **图片视觉解读** (可选): 如果帖子包含图片,我会提供VLM(视觉语言模型)对结合图片对post的解读
+
+你的任务是深度分析这篇Post(综合文本post和可能有的vlm解读信息),并输出一份结构化的《内容内化与再创作报告》,旨在帮助我提升语言组织、逻辑和表达能力。
+
+# 3. 约束条件 (Constraints)
+
+* **深度与增量**: 你的分析和再创作必须提供超越原文的价值,严禁简单的同义替换或总结。
+* **教学导向**: 你的报告不是为了直接发布,而是为了"教会"我。因此,过程、方法和技巧的拆解至关重要。
+* **结构化输出**: 必须严格遵循下面定义的JSON输出格式,不得有任何遗漏。
+* **CRITICAL**: 你必须只返回JSON格式的数据,不要添加任何markdown格式、标题、说明文字或其他内容。输出必须是可以直接被json.loads()解析的纯JSON对象。
+
+# 4. 工作流与输出格式
+
+请严格按照以下JSON结构,完成你的分析与创作报告:
+
+{
+  "page_title": "为这篇笔记生成一个简洁、吸引人的标题(10-25个字),能够概括核心主题,适合作为Notion页面标题",
+  "deconstruction": {
+    "post_type": "分析原文属于哪种类型。候选:'技术洞察', '行业观察', '产品评论', '个人感悟', '新闻速递', '生活分享', '教程指南'。",
+    "core_thesis": "用一句话精准提炼原文的核心论点或情感核心。如果有图片,请融合vlm结合视觉的整体解读。",
+    "underlying_assumption": "分析原文背后未明说的假设、价值观或情绪动机。"
+  },
+  "internalization_and_expression_techniques": {
+    "primary_insight": "这个信息最重要的价值点或最触动人心的洞察是什么?(So What?) ",
+    "technique_analysis": [
+      {
+        "technique_name": "类比/比喻 (Analogy/Metaphor)",
+        "application_suggestion": "针对原文内容,提出一个绝妙的、能让外行秒懂的类比。如果原文不适合此类比,请说明原因。"
+      },
+      {
+        "technique_name": "故事化叙事 (Storytelling)",
+        "application_suggestion": "如何将原文的观点或信息,包装成一个带有角色、冲突和解决方案的微型故事?请构思一个简短的故事框架。"
+      },
+      {
+        "technique_name": "数据/案例支撑 (Data/Case Support)",
+        "application_suggestion": "如果原文是观点型,可以引用哪些数据或具体案例来增强其说服力?如果原文是事实型,如何提炼其关键数据使其更具冲击力?"
+      },
+      {
+        "technique_name": "挑战常规/逆向思考 (Contrarian Thinking)",
+        "application_suggestion": "原文的观点是否存在可以挑战的盲区?提出一个与原文相反或更高维度的看问题的角度。"
+      }
+    ]
+  },
+  "reconstruction_showcase": [
+    {
+      "style": "锐利断言式 (适合X/Twitter)",
+      "content": "创作一条140字以内的、以强有力断言开头的Post,结尾附带一个引发思考的开放式问题。",
+      "rationale": "解释为什么这种风格适合这个主题,以及它如何抓住注意力。"
+    },
+    {
+      "style": "温和分享式 (适合即刻/朋友圈)",
+      "content": "创作一条带有呼吸感、分段清晰、使用1-2个Emoji来营造氛围的Post,侧重于分享个人化的感受和启发。",
+      "rationale": "解释这种风格如何建立情感连接和亲和力。"
+    },
+    {
+      "style": "深度分析式 (适合作为演讲或播客素材)",
+      "content": "将原文内容扩展成一段300字左右的短评,结构为:引入背景 -> 阐述核心观点 -> 引用类比或案例 -> 总结拔高。",
+      "rationale": "解释这种结构如何清晰地传递深度信息,并展示逻辑层次。"
+    }
+  ]
+}
+
+**重要提示**:
+1. 你的响应必须是上面JSON结构的精确实现,不要有任何额外的文字、标题、前言或说明
+2. 不要使用markdown代码块包裹(不要使用 ```json ... ```)
+3. 直接输出原始JSON对象,确保可以被标准JSON解析器直接解析
+4. 所有字段都必须填写完整,不能遗漏
+5. 禁止输出任何非JSON格式的内容,包括markdown标题、分隔线、解释性文字等
+
+[原文Post]如下:
+```
+"""
+_PROMPT_SUFFIX = """
+```
+"""
+
 
 class LLMProcessor:
     """LLM处理器,支持优先级评估和深度分析"""
@@ -34,12 +209,64 @@ class LLMProcessor:
         if not self.api_key:
             raise ValueError("未找到OPENAI_API_KEY配置")
 
-        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        # 所有工作线程共享一个HTTP/2连接池,避免每个线程各自建立TCP+TLS连接
+        processing_config = config.get_processing_config()
+        workers = max(processing_config['fast_llm_workers'], processing_config['smart_model_workers'], 1)
+        self.http_client = httpx.Client(
+            http2=True,
+            timeout=httpx.Timeout(600.0, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=workers, max_connections=workers * 2)
+        )
+        # 重试统一由 _make_request 的循环负责,SDK内部不再重复重试
+        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                             http_client=self.http_client, max_retries=0)
+
+        # 磁盘响应缓存:相同模型+提示词直接复用结果,避免重复计费
+        self.cache_ttl = llm_config.get('cache_ttl', 7 * 24 * 3600)
+        self._cache = None
+        if llm_config.get('cache_enabled'):
+            cache_dir = llm_config.get('cache_dir', '.llm_cache')
+            self._cache = diskcache.Cache(cache_dir, size_limit=2 << 30)
+            logger.info(f"LLM响应缓存已启用: {cache_dir}")
 
         logger.info(f"LLM处理器初始化成功")
         logger.info(f"Fast Model: {self.fast_model}")
         logger.info(f"Smart Models: {self.smart_models}")
 
+    @staticmethod
+    def _cache_key(model_name: str, prompt: str) -> str:
+        """生成缓存键: sha256(模型名 + 空白归一化后的提示词)
+
+        转发或重复发布的帖子常常只在换行、缩进、首尾空格上有差异,
+        归一化空白后这些帖子可以命中同一条缓存
+        """
+        normalized = _WHITESPACE_RE.sub(' ', prompt).strip()
+        return hashlib.sha256(f"{model_name}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def _cache_get(self, model_name: str, prompt: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的LLM响应,未启用或未命中返回None"""
+        if self._cache is None:
+            return None
+
+        cached = self._cache.get(self._cache_key(model_name, prompt))
+        if cached is not None:
+            logger.debug(f"LLM缓存命中: {model_name}")
+        return cached
+
+    def _cache_set(self, model_name: str, prompt: str, result: Dict[str, Any]):
+        """缓存已验证可用的LLM响应"""
+        if self._cache is None:
+            return
+
+        self._cache.set(self._cache_key(model_name, prompt), result, expire=self.cache_ttl)
+
+    def _cache_delete(self, model_name: str, prompt: str):
+        """删除缓存的LLM响应(如早先缓存的响应已无法通过校验)"""
+        if self._cache is None:
+            return
+
+        self._cache.delete(self._cache_key(model_name, prompt))
+
     def _make_request(self, prompt: str, model_name: str, temperature: float = 0.3, max_retries: int = 3, max_tokens: Optional[int] = None) -> Dict[str, Any]:
         """执行LLM请求,支持streaming和重试机制
 
@@ -58,13 +285,13 @@ class LLMProcessor:
 
         for attempt in range(max_retries):
             try:
-                logger.info(f"调用LLM: {model_name} (尝试 {attempt + 1}/{max_retries})")
+                logger.debug(f"调用LLM: {model_name} (尝试 {attempt + 1}/{max_retries})")
 
                 # 创建streaming请求
                 response = self.client.chat.completions.create(
                     model=model_name,
                     messages=[
-                        {'role': 'system', 'content': '你是一个专业的内容分析师,擅长总结和提取关键信息。'},
+                        {'role': 'system', 'content': _SYSTEM_PROMPT},
                         {'role': 'user', 'content': prompt}
                     ],
                     temperature=temperature,
@@ -72,8 +299,8 @@ class LLMProcessor:
                     stream=True
                 )
 
-                # 收集streaming响应
-                full_content = ""
+                # 收集streaming响应:先放入列表,结束后一次拼接,避免字符串反复 += 的复制开销
+                content_parts = []
                 chunk_count = 0
 
                 for chunk in response:
@@ -89,16 +316,18 @@ class LLMProcessor:
                         content_chunk = getattr(delta, 'content', None)
 
                         if content_chunk:
-                            full_content += content_chunk
+                            content_parts.append(content_chunk)
 
                     except Exception as chunk_error:
                         logger.warning(f"Chunk {chunk_count} 处理异常: {chunk_error}")
                         continue
 
-                logger.info(f"LLM调用完成 - 响应内容长度: {len(full_content)} 字符")
+                full_content = ''.join(content_parts)
+
+                logger.info(f"LLM调用完成: {model_name} (尝试 {attempt + 1}/{max_retries}) - 响应内容长度: {len(full_content)} 字符")
 
                 if not full_content.strip():
-                    raise ValueError("LLM返回空响应")
+                    raise _EmptyResponseError("LLM返回空响应")
 
                 return {
                     'success': True,
@@ -116,61 +345,92 @@ class LLMProcessor:
                         'success': False,
                         'error': error_msg,
                         'model': model_name,
-                        'total_attempts': max_retries
+                        'total_attempts': max_retries,
+                        # API返回的HTTP状态码(网络错误等非HTTP异常为None),供调用方判断是否过载
+                        'status_code': getattr(e, 'status_code', None),
+                        'error_class': _classify_error(e)
                     }
                 else:
                     wait_time = (attempt + 1) * 2
                     logger.info(f"等待 {wait_time} 秒后重试...")
                     time.sleep(wait_time)
 
-    def run_priority_analysis(self, post_content: str) -> Dict[str, Any]:
-        """运行优先级分析(Fast LLM)
+    async def _make_request_async(self, client: AsyncOpenAI, prompt: str, model_name: str,
+                                  temperature: float = 0.3, max_retries: int = 3,
+                                  max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """_make_request 的异步版本,返回格式相同"""
+        request_max_tokens = max_tokens if max_tokens is not None else self.max_tokens
 
-        Args:
-            post_content: 帖子内容
+        for attempt in range(max_retries):
+            try:
+                logger.debug(f"调用LLM: {model_name} (尝试 {attempt + 1}/{max_retries})")
 
-        Returns:
-            分析结果,包含:
-                - success: 是否成功
-                - post_category: 帖子分类
-                - has_image: 是否包含图片
-                - attributes: 各项属性判断
-                - error: 错误信息(如果失败)
-        """
-        # 构建提示词
-        prompt = f"""# 角色
-你是一名高效、精准的内容预处理器。你的任务是分析一篇社交媒体帖子,并以严格的JSON格式输出其元数据和属性。
+                response = await client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {'role': 'system', 'content': _SYSTEM_PROMPT},
+                        {'role': 'user', 'content': prompt}
+                    ],
+                    temperature=temperature,
+                    max_tokens=request_max_tokens,
+                    stream=True
+                )
 
-# 核心任务
-我将提供一篇社交媒体帖子。请完成以下三项分析:
-1. **分类**: 从给定列表中为帖子选择最合适的类别。
-2. **图片检测**: 判断帖子内容中是否包含图片链接(格式如 `![](URL)` 或 `![alt](URL)`)。
-3. **属性判断**: 判断帖子是否具备某些关键特质。
+                content_parts = []
+                async for chunk in response:
+                    if not getattr(chunk, 'choices', None):
+                        continue
 
-# 约束条件
-* 对于所有的布尔类型判断,请使用 `1` 代表 `true`,使用 `0` 代表 `false`。
+                    content_chunk = getattr(chunk.choices[0].delta, 'content', None)
+                    if content_chunk:
+                        content_parts.append(content_chunk)
 
-# 输出格式 (严格遵循此JSON结构,不要有任何额外解释)
-{{
-  "post_category": "<从'技术洞察', '行业观察', '产品评论', '个人感悟', '新闻速递', '生活分享', '教程指南', '其他'中选择一个>",
-  "has_image": <1 或 0>,
-  "attributes": {{
-    "has_unique_insight": <1 或 0>,
-    "is_inspirational": <1 或 0>,
-    "is_well_written": <1 或 0>,
-    "is_debatable": <1 或 0>
-  }}
-}}
+                full_content = ''.join(content_parts)
 
-[原文Post]如下:
-```
-{post_content}
-```
-"""
+                logger.info(f"LLM调用完成: {model_name} (尝试 {attempt + 1}/{max_retries}) - 响应内容长度: {len(full_content)} 字符")
 
-        # 调用Fast Model
-        result = self._make_request(prompt, self.fast_model, temperature=0.1)
+                if not full_content.strip():
+                    raise _EmptyResponseError("LLM返回空响应")
 
+                return {
+                    'success': True,
+                    'content': full_content.strip(),
+                    'model': model_name,
+                    'attempt': attempt + 1
+                }
+
+            except Exception as e:
+                error_msg = f"LLM调用失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}"
+                logger.error(error_msg)
+
+                if attempt == max_retries - 1:
+                    return {
+                        'success': False,
+                        'error': error_msg,
+                        'model': model_name,
+                        'total_attempts': max_retries,
+                        'status_code': getattr(e, 'status_code', None),
+                        'error_class': _classify_error(e)
+                    }
+                else:
+                    wait_time = (attempt + 1) * 2
+                    logger.info(f"等待 {wait_time} 秒后重试...")
+                    await asyncio.sleep(wait_time)
+
+    def _build_priority_prompt(self, post_content: str) -> str:
+        """构建优先级分析提示词"""
+        return ''.join((_PRIORITY_PROMPT_PREFIX, post_content, _PROMPT_SUFFIX))
+
+    def _parse_priority_response(self, result: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+        """解析优先级分析的LLM响应,解析成功时写入缓存
+
+        Args:
+            result: _make_request 返回的响应结果
+            prompt: 对应的提示词(用于缓存键)
+
+        Returns:
+            分析结果,格式同 run_priority_analysis
+        """
         if not result.get('success'):
             return result
 
@@ -179,24 +439,39 @@ class LLMProcessor:
             content = result['content']
 
             # 尝试提取JSON部分(可能包含在```json```代码块中)
-            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
+            json_match = _PRIORITY_JSON_BLOCK_RE.search(content)
             if json_match:
                 json_str = json_match.group(1)
             else:
                 # 尝试直接解析
                 json_str = content
 
-            analysis = json.loads(json_str)
+            analysis = orjson.loads(json_str)
+            if not isinstance(analysis, dict) or not isinstance(analysis.get('attributes', {}), dict):
+                logger.error(f"优先级分析响应格式不正确: {result['content']}")
+                # 该响应可能来自旧版本写入的缓存,删除后下次重新请求
+                self._cache_delete(self.fast_model, prompt)
+                return {
+                    'success': False,
+                    'error': "响应JSON不是预期的对象格式",
+                    'raw_content': result['content']
+                }
 
-            return {
+            parsed = {
                 'success': True,
                 'post_category': analysis.get('post_category', '其他'),
                 'has_image': bool(analysis.get('has_image', 0)),
                 'attributes': analysis.get('attributes', {}),
                 'model': result['model']
             }
+            # 写库时直接使用的JSON文本(不含本字段自身)
+            parsed['priority_analysis_json'] = dumps_json(parsed)
 
-        except json.JSONDecodeError as e:
+            # 仅缓存解析并校验通过的响应
+            self._cache_set(self.fast_model, prompt, result)
+            return parsed
+
+        except orjson.JSONDecodeError as e:
             logger.error(f"JSON解析失败: {e}")
             logger.error(f"原始响应: {result['content']}")
             return {
@@ -205,6 +480,244 @@ class LLMProcessor:
                 'raw_content': result['content']
             }
 
+    def run_priority_analysis(self, post_content: str) -> Dict[str, Any]:
+        """运行优先级分析(Fast LLM)
+
+        Args:
+            post_content: 帖子内容
+
+        Returns:
+            分析结果,包含:
+                - success: 是否成功
+                - post_category: 帖子分类
+                - has_image: 是否包含图片
+                - attributes: 各项属性判断
+                - error: 错误信息(如果失败)
+        """
+        prompt = self._build_priority_prompt(post_content)
+
+        # 调用Fast Model(优先使用缓存)
+        result = self._cache_get(self.fast_model, prompt)
+        if result is None:
+            result = self._make_request(prompt, self.fast_model, temperature=0.1)
+
+        return self._parse_priority_response(result, prompt)
+
+    def run_priority_analysis_many(self, post_contents: List[str], concurrency: int = 10,
+                                   rate_limiter: Optional[TokenBucket] = None,
+                                   on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None
+                                   ) -> List[Dict[str, Any]]:
+        """并发运行多条优先级分析(asyncio + AsyncOpenAI)
+
+        请求受网络延迟限制而非CPU,单线程事件循环即可同时保持 concurrency 个请求在途;
+        磁盘缓存读写和 on_result 回调这类阻塞操作放到线程中执行,不会卡住在途的请求。
+
+        Args:
+            post_contents: 帖子内容列表
+            concurrency: 最大同时在途请求数
+            rate_limiter: 可选的令牌桶,每次实际发起API请求前预约令牌(缓存命中不消耗)
+            on_result: 每完成一条立即回调 on_result(索引, 分析结果),在单独的回调线程中依次执行,
+                       回调可以做写库等阻塞操作,回调之间无需加锁
+
+        Returns:
+            与 post_contents 一一对应的分析结果列表,格式同 run_priority_analysis
+        """
+        return asyncio.run(self._run_priority_analysis_many(post_contents, concurrency, rate_limiter, on_result))
+
+    async def _run_priority_analysis_many(self, post_contents: List[str], concurrency: int,
+                                          rate_limiter: Optional[TokenBucket],
+                                          on_result: Optional[Callable[[int, Dict[str, Any]], None]]
+                                          ) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = [None] * len(post_contents)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        loop = asyncio.get_running_loop()
+        # 回调可能写数据库,放到单独的线程中依次执行:不阻塞事件循环,回调之间也保持串行
+        callback_executor = ThreadPoolExecutor(max_workers=1) if on_result else None
+
+        # 异步客户端绑定在本次事件循环上,结束时随 async with 一起关闭
+        http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(600.0, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=concurrency, max_connections=concurrency * 2)
+        )
+        try:
+            async with AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                   http_client=http_client, max_retries=0) as client:
+
+                async def analyze(index: int, post_content: str):
+                    prompt = self._build_priority_prompt(post_content)
+
+                    # 磁盘缓存读写是同步IO,在线程中执行
+                    result = await asyncio.to_thread(self._cache_get, self.fast_model, prompt)
+                    if result is None:
+                        async with semaphore:
+                            if rate_limiter:
+                                await asyncio.sleep(rate_limiter.reserve())
+                            result = await self._make_request_async(client, prompt, self.fast_model, temperature=0.1)
+
+                    # 解析成功后写入缓存,同样在线程中执行
+                    results[index] = await asyncio.to_thread(self._parse_priority_response, result, prompt)
+                    if on_result:
+                        await loop.run_in_executor(callback_executor, on_result, index, results[index])
+
+                outcomes = await asyncio.gather(
+                    *(analyze(i, content) for i, content in enumerate(post_contents)),
+                    return_exceptions=True
+                )
+        finally:
+            if callback_executor:
+                callback_executor.shutdown(wait=True)
+
+        for i, outcome in enumerate(outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"优先级分析出错: {outcome}")
+                if results[i] is None:
+                    results[i] = {'success': False, 'error': str(outcome)}
+
+        return results
+
+    def run_priority_analysis_batch(self, posts: List[Dict[str, Any]], max_wait: float = 1200,
+                                    poll_interval: float = 10) -> List[Optional[Dict[str, Any]]]:
+        """通过OpenAI Batch API批量运行优先级分析(费用约为实时调用的一半)
+
+        缓存命中的帖子不会提交。超过 max_wait 时取消任务,取消前已完成的请求仍从部分结果文件中读取;
+        未得到结果或单条失败的帖子返回None,由调用方回退到实时调用。
+
+        Args:
+            posts: 帖子列表,需包含 source_platform, source_post_id, original_content
+            max_wait: 最长等待秒数,超时后取消批任务
+            poll_interval: 初始轮询间隔(秒),之后按指数退避增长
+
+        Returns:
+            与 posts 一一对应的分析结果列表
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(posts)
+        prompts = [self._build_priority_prompt(post['original_content']) for post in posts]
+
+        pending: Dict[str, int] = {}
+        lines = []
+        for i, (post, prompt) in enumerate(zip(posts, prompts)):
+            cached = self._cache_get(self.fast_model, prompt)
+            if cached is not None:
+                results[i] = self._parse_priority_response(cached, prompt)
+                continue
+
+            custom_id = f"{post['source_platform']}/{post['source_post_id']}"
+            pending[custom_id] = i
+            lines.append(json.dumps({
+                'custom_id': custom_id,
+                'method': 'POST',
+                'url': '/v1/chat/completions',
+                'body': {
+                    'model': self.fast_model,
+                    'messages': [
+                        {'role': 'system', 'content': _SYSTEM_PROMPT},
+                        {'role': 'user', 'content': prompt}
+                    ],
+                    'temperature': 0.1,
+                    'max_tokens': self.max_tokens
+                }
+            }, ensure_ascii=False))
+
+        if not pending:
+            return results
+
+        # Batch相关的文件/任务接口没有外层重试循环,保留SDK默认的重试
+        client = self.client.with_options(max_retries=2)
+
+        try:
+            batch_file = client.files.create(
+                file=('priority_batch.jsonl', '\n'.join(lines).encode('utf-8')),
+                purpose='batch'
+            )
+            batch = client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint='/v1/chat/completions',
+                completion_window='24h'
+            )
+            logger.info(f"已提交Batch任务 {batch.id} (共 {len(pending)} 个请求)")
+
+            # 轮询任务状态,指数退避
+            deadline = time.monotonic() + max_wait
+            wait = poll_interval
+            while batch.status not in _BATCH_FINAL_STATUSES:
+                if time.monotonic() + wait > deadline:
+                    logger.warning(f"Batch任务 {batch.id} 超过 {max_wait} 秒未完成,取消,未完成的帖子回退到实时调用")
+                    batch = self._cancel_batch(client, batch)
+                    break
+
+                time.sleep(wait)
+                wait = min(wait * 1.5, 60)
+                batch = client.batches.retrieve(batch.id)
+                logger.info(f"Batch任务 {batch.id} 状态: {batch.status}")
+
+            if batch.status != 'completed':
+                logger.warning(f"Batch任务 {batch.id} 未成功完成: {batch.status},读取已完成部分的结果")
+
+            # 取消、失败或过期的任务也可能带有已完成请求的部分结果
+            if batch.output_file_id:
+                self._parse_batch_output(client.files.content(batch.output_file_id).text,
+                                         pending, prompts, results)
+            if batch.error_file_id:
+                error_count = sum(1 for line in client.files.content(batch.error_file_id).text.splitlines()
+                                  if line.strip())
+                logger.warning(f"Batch任务 {batch.id} 有 {error_count} 个请求失败,回退到实时调用")
+
+        except Exception as e:
+            logger.error(f"Batch API调用失败,未得到结果的帖子回退到实时调用: {e}")
+            return results
+
+        logger.info(f"Batch任务完成: {sum(1 for r in results if r)}/{len(posts)} 个帖子得到结果")
+        return results
+
+    @staticmethod
+    def _cancel_batch(client: OpenAI, batch):
+        """取消Batch任务,并等待其进入终止状态(最多 _BATCH_CANCEL_WAIT 秒),返回最新的任务对象"""
+        batch = client.batches.cancel(batch.id)
+        deadline = time.monotonic() + _BATCH_CANCEL_WAIT
+        while batch.status not in _BATCH_FINAL_STATUSES and time.monotonic() < deadline:
+            time.sleep(5)
+            batch = client.batches.retrieve(batch.id)
+        return batch
+
+    def _parse_batch_output(self, output: str, pending: Dict[str, int], prompts: List[str],
+                            results: List[Optional[Dict[str, Any]]]):
+        """解析Batch结果文件,每行对应一个请求,成功解析的结果写入 results 对应位置
+
+        Args:
+            output: 结果文件内容(JSONL)
+            pending: custom_id -> 帖子索引
+            prompts: 与帖子一一对应的提示词
+            results: 结果列表,原地更新
+        """
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+
+            try:
+                row = json.loads(line)
+                index = pending.get(row.get('custom_id'))
+                response = row.get('response') or {}
+                if index is None or response.get('status_code') != 200:
+                    continue
+
+                body = response['body']
+                content = body['choices'][0]['message']['content'] or ''
+                if not content.strip():
+                    continue
+
+                result = {
+                    'success': True,
+                    'content': content.strip(),
+                    'model': body.get('model', self.fast_model)
+                }
+                parsed = self._parse_priority_response(result, prompts[index])
+                if parsed.get('success'):
+                    results[index] = parsed
+
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                logger.warning(f"解析Batch结果行失败: {e}")
+
     def calculate_priority_score(self, priority_analysis: Dict[str, Any], content_length: int) -> int:
         """计算最终优先级分数
 
@@ -215,27 +728,12 @@ class LLMProcessor:
         Returns:
             最终分数 (0-100)
         """
-        score = 0
-
         # LLM属性分 (总计70分)
         attributes = priority_analysis.get('attributes', {})
-        if attributes.get('has_unique_insight'):
-            score += 35
-        if attributes.get('is_inspirational'):
-            score += 20
-        if attributes.get('is_debatable'):
-            score += 10
-        if attributes.get('is_well_written'):
-            score += 5
+        score = sum(weight for name, weight in _ATTRIBUTE_WEIGHTS if attributes.get(name))
 
         # 内容类型分 (总计15分)
-        category = priority_analysis.get('post_category', '')
-        if category in ['技术洞察', '行业观察', '个人感悟']:
-            score += 15
-        elif category in ['产品评论', '教程指南']:
-            score += 10
-        elif category in ['新闻速递', '生活分享']:
-            score += 5
+        score += _CATEGORY_SCORES.get(priority_analysis.get('post_category', ''), 0)
 
         # 内容丰富度分 (总计15分)
         if content_length > 150:
@@ -243,7 +741,7 @@ class LLMProcessor:
         if priority_analysis.get('has_image'):
             score += 5
 
-        logger.info(f"计算得分: {score} (属性分 + 类型分 + 丰富度分)")
+        logger.debug(f"计算得分: {score} (属性分 + 类型分 + 丰富度分)")
         return score
 
     def _extract_json_from_response(self, content: str) -> Optional[Dict]:
@@ -261,15 +759,14 @@ class LLMProcessor:
 
         content = content.strip()
 
-        # 方法1: 尝试直接解析
+        # 方法1: 尝试直接解析(快速路径,格式规范的响应无需经过后续正则)
         try:
-            return json.loads(content)
-        except json.JSONDecodeError:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
             pass
 
         # 方法2: 提取 ```json ... ``` 代码块 (贪婪模式)
-        json_block_pattern = r'```(?:json)?\s*(\{.*\})\s*```'
-        json_match = re.search(json_block_pattern, content, re.DOTALL)
+        json_match = _JSON_BLOCK_RE.search(content)
         if json_match:
             try:
                 json_str = json_match.group(1).strip()
@@ -295,7 +792,8 @@ class LLMProcessor:
         # 方法4: 提取第一个 { 到最后一个 } 之间的内容
         first_brace = content.find('{')
         last_brace = content.rfind('}')
-        if first_brace != -1 and last_brace != -1 and last_brace > first_brace:
+        braces_tried = first_brace != -1 and last_brace != -1 and last_brace > first_brace
+        if braces_tried:
             extracted = content[first_brace:last_brace+1]
             try:
                 return json.loads(extracted)
@@ -308,13 +806,13 @@ class LLMProcessor:
 
         # 方法5: 尝试找到所有可能的JSON对象 (使用非贪婪和贪婪两种模式)
         # 某些LLM可能在JSON前后添加额外的文本
-        all_brace_patterns = [
-            r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}',  # 非贪婪,匹配嵌套
-            r'\{.*\}',  # 贪婪模式
-        ]
+        # 贪婪模式的唯一匹配就是方法4中第一个 { 到最后一个 } 的内容,方法4已尝试过则跳过
+        all_brace_patterns = [_NESTED_BRACES_RE]  # 非贪婪,匹配嵌套
+        if not braces_tried:
+            all_brace_patterns.append(_GREEDY_BRACES_RE)  # 贪婪模式
 
         for pattern in all_brace_patterns:
-            matches = re.findall(pattern, content, re.DOTALL)
+            matches = pattern.findall(content)
             # 按长度从长到短排序,优先尝试最长的匹配
             matches.sort(key=len, reverse=True)
 
@@ -323,7 +821,7 @@ class LLMProcessor:
                     parsed = json.loads(match)
                     # 验证是否包含必要的顶层键
                     if isinstance(parsed, dict) and len(parsed) > 0:
-                        logger.info(f"使用正则模式 {pattern} 成功提取JSON")
+                        logger.info(f"使用正则模式 {pattern.pattern} 成功提取JSON")
                         return parsed
                 except json.JSONDecodeError:
                     continue
@@ -332,7 +830,7 @@ class LLMProcessor:
         # 6.1: 去除JSON字符串中的控制字符
         try:
             # 移除不可见字符
-            cleaned = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', content)
+            cleaned = _CTRL_CHARS_RE.sub('', content)
             # 提取大括号内容
             first_brace = cleaned.find('{')
             last_brace = cleaned.rfind('}')
@@ -365,88 +863,7 @@ class LLMProcessor:
             分析结果,包含完整的JSON报告
         """
         # 构建深度分析提示词(根据规划文档)
-        prompt = f"""# 1. 角色 (Role)
-
-你是一位顶级的演讲教练与内容策略顾问,擅长将复杂或零散的信息,通过深刻的洞察和精妙的语言技巧,重塑为具有强大影响力和传播力的内容。你的核心能力是"点石成金",而非简单复述。
-
-# 2. 核心任务 (Task)
-
-我将提供一个`[原文Post]`,它来自社交媒体。Post内容可能包含两部分:
-1. **原始帖子内容**: 用户发布的文字
-2. **图片视觉解读** (可选): 如果帖子包含图片,我会提供VLM(视觉语言模型)对结合图片对post的解读
-
-你的任务是深度分析这篇Post(综合文本post和可能有的vlm解读信息),并输出一份结构化的《内容内化与再创作报告》,旨在帮助我提升语言组织、逻辑和表达能力。
-
-# 3. 约束条件 (Constraints)
-
-* **深度与增量**: 你的分析和再创作必须提供超越原文的价值,严禁简单的同义替换或总结。
-* **教学导向**: 你的报告不是为了直接发布,而是为了"教会"我。因此,过程、方法和技巧的拆解至关重要。
-* **结构化输出**: 必须严格遵循下面定义的JSON输出格式,不得有任何遗漏。
-* **CRITICAL**: 你必须只返回JSON格式的数据,不要添加任何markdown格式、标题、说明文字或其他内容。输出必须是可以直接被json.loads()解析的纯JSON对象。
-
-# 4. 工作流与输出格式
-
-请严格按照以下JSON结构,完成你的分析与创作报告:
-
-{{
-  "page_title": "为这篇笔记生成一个简洁、吸引人的标题(10-25个字),能够概括核心主题,适合作为Notion页面标题",
-  "deconstruction": {{
-    "post_type": "分析原文属于哪种类型。候选:'技术洞察', '行业观察', '产品评论', '个人感悟', '新闻速递', '生活分享', '教程指南'。",
-    "core_thesis": "用一句话精准提炼原文的核心论点或情感核心。如果有图片,请融合vlm结合视觉的整体解读。",
-    "underlying_assumption": "分析原文背后未明说的假设、价值观或情绪动机。"
-  }},
-  "internalization_and_expression_techniques": {{
-    "primary_insight": "这个信息最重要的价值点或最触动人心的洞察是什么?(So What?) ",
-    "technique_analysis": [
-      {{
-        "technique_name": "类比/比喻 (Analogy/Metaphor)",
-        "application_suggestion": "针对原文内容,提出一个绝妙的、能让外行秒懂的类比。如果原文不适合此类比,请说明原因。"
-      }},
-      {{
-        "technique_name": "故事化叙事 (Storytelling)",
-        "application_suggestion": "如何将原文的观点或信息,包装成一个带有角色、冲突和解决方案的微型故事?请构思一个简短的故事框架。"
-      }},
-      {{
-        "technique_name": "数据/案例支撑 (Data/Case Support)",
-        "application_suggestion": "如果原文是观点型,可以引用哪些数据或具体案例来增强其说服力?如果原文是事实型,如何提炼其关键数据使其更具冲击力?"
-      }},
-      {{
-        "technique_name": "挑战常规/逆向思考 (Contrarian Thinking)",
-        "application_suggestion": "原文的观点是否存在可以挑战的盲区?提出一个与原文相反或更高维度的看问题的角度。"
-      }}
-    ]
-  }},
-  "reconstruction_showcase": [
-    {{
-      "style": "锐利断言式 (适合X/Twitter)",
-      "content": "创作一条140字以内的、以强有力断言开头的Post,结尾附带一个引发思考的开放式问题。",
-      "rationale": "解释为什么这种风格适合这个主题,以及它如何抓住注意力。"
-    }},
-    {{
-      "style": "温和分享式 (适合即刻/朋友圈)",
-      "content": "创作一条带有呼吸感、分段清晰、使用1-2个Emoji来营造氛围的Post,侧重于分享个人化的感受和启发。",
-      "rationale": "解释这种风格如何建立情感连接和亲和力。"
-    }},
-    {{
-      "style": "深度分析式 (适合作为演讲或播客素材)",
-      "content": "将原文内容扩展成一段300字左右的短评,结构为:引入背景 -> 阐述核心观点 -> 引用类比或案例 -> 总结拔高。",
-      "rationale": "解释这种结构如何清晰地传递深度信息,并展示逻辑层次。"
-    }}
-  ]
-}}
-
-**重要提示**:
-1. 你的响应必须是上面JSON结构的精确实现,不要有任何额外的文字、标题、前言或说明
-2. 不要使用markdown代码块包裹(不要使用 ```json ... ```)
-3. 直接输出原始JSON对象,确保可以被标准JSON解析器直接解析
-4. 所有字段都必须填写完整,不能遗漏
-5. 禁止输出任何非JSON格式的内容,包括markdown标题、分隔线、解释性文字等
-
-[原文Post]如下:
-```
-{post_content}
-```
-"""
+        prompt = ''.join((_DEPTH_PROMPT_PREFIX, post_content, _PROMPT_SUFFIX))
 
         # 尝试多个Smart Model
         last_result = None
@@ -454,7 +871,9 @@ class LLMProcessor:
         for model_name in self.smart_models:
             logger.info(f"尝试使用Smart Model: {model_name}")
 
-            result = self._make_request(prompt, model_name, temperature=0.5, max_retries=2, max_tokens=self.smart_model_max_tokens)
+            result = self._cache_get(model_name, prompt)
+            if result is None:
+                result = self._make_request(prompt, model_name, temperature=0.5, max_retries=2, max_tokens=self.smart_model_max_tokens)
 
             if result.get('success'):
                 # 使用改进的JSON提取方法
@@ -472,14 +891,17 @@ class LLMProcessor:
                         last_result = {
                             'success': False,
                             'error': f"JSON缺少必要字段: {missing_fields}",
+                            'error_class': 'missing_fields',
                             'model': model_name,
                             'raw_content': content
                         }
                     else:
                         logger.info(f"成功解析JSON报告,包含所有必要字段")
+                        self._cache_set(model_name, prompt, result)
                         return {
                             'success': True,
                             'report': analysis_report,
+                            'report_json': dumps_json(analysis_report),
                             'model': result['model']
                         }
                 else:
@@ -488,6 +910,7 @@ class LLMProcessor:
                     last_result = {
                         'success': False,
                         'error': '无法从响应中提取有效JSON',
+                        'error_class': 'invalid_json',
                         'model': model_name,
                         'raw_content': content
                     }
@@ -495,6 +918,11 @@ class LLMProcessor:
             else:
                 last_result = result
 
+            # 格式类错误换模型也无法解决,直接结束,不再等待和消耗后续模型的配额
+            if last_result.get('error_class') in _TERMINAL_ERROR_CLASSES:
+                logger.warning(f"模型 {model_name} 出现不可重试的错误({last_result['error_class']}),不再尝试其他模型")
+                break
+
             # 如果不是最后一个模型,等待后重试下一个
             if model_name != self.smart_models[-1]:
                 logger.info(f"模型 {model_name} 失败,等待 {retry_delay} 秒后尝试下一个模型...")
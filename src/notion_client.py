@@ -2,16 +2,234 @@
 Notion API 客户端
 用于将学习报告推送到Notion页面,支持年/月/日层级结构
 """
+import functools
 import logging
+import diskcache
+import orjson
 import requests
-import json
-import re
-from typing import Dict, Any, List, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 from datetime import datetime
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .rate_limiter import TokenBucket
+
 logger = logging.getLogger(__name__)
 
 
+# Notion API限速约为每秒3个请求
+_NOTION_REQUESTS_PER_SEC = 3.0
+# 到Notion的最大长连接数,覆盖推送线程数
+_HTTP_POOL_SIZE = 10
+# Notion单个富文本节点的最大字符数
+_MAX_TEXT_CONTENT = 2000
+# 截断长文本时,允许向前回退到空白处的最大字符数
+_TRUNCATE_WORD_WINDOW = 100
+# Notion单次请求最多可携带的子块数
+_MAX_BLOCKS_PER_REQUEST = 100
+# 获取子块列表时每页的数量(Notion上限100)
+_CHILDREN_PAGE_SIZE = 100
+# 子页面列表缓存有效期(秒)
+_CHILDREN_CACHE_TTL = 60.0
+# 非幂等的写请求,只在429时重试
+_WRITE_METHODS = frozenset(['POST', 'PATCH'])
+
+
+# 静态块模板:create_page 只做JSON序列化不会修改块内容,可直接复用同一个对象;
+# 以 orjson.Fragment 保存预先序列化好的JSON,发送请求时原样拼接,不再逐个序列化
+_DIVIDER_BLOCK = orjson.Fragment(orjson.dumps({"object": "block", "type": "divider", "divider": {}}))
+_BOLD = orjson.Fragment(orjson.dumps({"bold": True}))
+_ITALIC = orjson.Fragment(orjson.dumps({"italic": True}))
+
+
+class _NotionRetry(Retry):
+    """Notion请求的重试策略
+
+    GET 是幂等的,在 429/5xx 和读超时时都重试;POST/PATCH(创建页面、追加子块)可能在服务端
+    已经生效后才超时或返回5xx,重试会创建重复页面或重复追加内容,因此只在明确未处理的 429 时
+    按 Retry-After 重试
+    """
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code == 429 and method in _WRITE_METHODS:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def _para(rich_text: List[Dict]) -> Dict:
+    """构建段落块"""
+    return {"object": "block", "type": "paragraph", "paragraph": {"rich_text": rich_text}}
+
+
+def _plain_rt(text: str) -> List[Dict]:
+    """构建不含Markdown的纯文本富文本(跳过链接/加粗解析),超长时按Notion限制拆分"""
+    return _split_text_node({"type": "text", "text": {"content": text}})
+
+
+def _match_link(text: str, start: int) -> Optional[Tuple[int, Dict]]:
+    """从 start 处的 '[' 开始匹配Markdown链接 [文本](http(s)://URL)
+
+    Returns:
+        (匹配结束位置, 链接富文本节点),不是合法链接时返回None
+    """
+    close = text.find(']', start + 1)
+    if close <= start + 1 or not text.startswith('(', close + 1):
+        return None
+
+    url_start = close + 2
+    if text.startswith('https://', url_start):
+        host_start = url_start + 8
+    elif text.startswith('http://', url_start):
+        host_start = url_start + 7
+    else:
+        return None
+
+    url_end = text.find(')', host_start)
+    if url_end <= host_start:
+        return None
+
+    return url_end + 1, {
+        "type": "text",
+        "text": {
+            "content": text[start + 1:close],
+            "link": {"url": text[url_start:url_end]}
+        }
+    }
+
+
+def _match_bold(text: str, start: int) -> Optional[Tuple[int, Dict]]:
+    """从 start 处的 '**' 开始匹配Markdown加粗 **文本**
+
+    Returns:
+        (匹配结束位置, 加粗富文本节点),不是合法加粗时返回None
+    """
+    close = text.find('*', start + 2)
+    if close <= start + 2 or not text.startswith('**', close):
+        return None
+
+    return close + 2, {
+        "type": "text",
+        "text": {"content": text[start + 2:close]},
+        "annotations": {"bold": True}
+    }
+
+
+def _iter_markup(text: str) -> Iterator[Tuple[int, int, Dict]]:
+    """单遍扫描文本中的Markdown链接和加粗,按出现顺序产出 (起始位置, 结束位置, 富文本节点)
+
+    每次取下一个 '[' 或 '**' 中较早的位置尝试匹配,失败则从下一个字符继续查找
+    """
+    link_at = text.find('[')
+    bold_at = text.find('**')
+
+    while link_at != -1 or bold_at != -1:
+        is_link = bold_at == -1 or (link_at != -1 and link_at < bold_at)
+        start = link_at if is_link else bold_at
+        matched = _match_link(text, start) if is_link else _match_bold(text, start)
+
+        if matched is None:
+            if is_link:
+                link_at = text.find('[', start + 1)
+            else:
+                bold_at = text.find('**', start + 1)
+            continue
+
+        end, node = matched
+        yield start, end, node
+
+        link_at = text.find('[', end)
+        bold_at = text.find('**', end)
+
+
+def _split_text_node(node: Dict) -> List[Dict]:
+    """把超过 _MAX_TEXT_CONTENT 字符的文本节点拆成多个,保留链接和样式"""
+    content = node["text"]["content"]
+    if len(content) <= _MAX_TEXT_CONTENT:
+        return [node]
+
+    parts = []
+    for i in range(0, len(content), _MAX_TEXT_CONTENT):
+        part = dict(node)
+        part["text"] = dict(node["text"], content=content[i:i + _MAX_TEXT_CONTENT])
+        parts.append(part)
+    return parts
+
+
+def _safe_truncate(text: str, limit: int) -> str:
+    """按字符数截断文本,尽量停在空白处,并且不截断Markdown链接/加粗
+
+    Args:
+        text: 原文本
+        limit: 最大字符数
+
+    Returns:
+        截断后的文本,未超长时原样返回
+    """
+    if len(text) <= limit:
+        return text
+
+    cut = limit
+    # 只在末尾附近回退到空白处:中文文本空格很少,回退过多会丢掉大量内容
+    space = max(text.rfind(' ', 0, limit), text.rfind('\n', 0, limit))
+    if space > 0 and limit - space <= _TRUNCATE_WORD_WINDOW:
+        cut = space
+
+    # 截断点落在链接/加粗内部时,退到该标记之前,避免留下无法解析的半截标记
+    for start, end, _ in _iter_markup(text):
+        if start >= cut:
+            break
+        if end > cut:
+            if start > 0:
+                cut = start
+            break
+
+    return text[:cut].rstrip()
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_rich_text_cached(text: str) -> Tuple[Dict, ...]:
+    """解析文本中的链接和Markdown格式(带缓存),返回不可变的节点元组"""
+    if not text:
+        return ({"type": "text", "text": {"content": ""}},)
+
+    rich_text = []
+    last_end = 0
+
+    for start, end, node in _iter_markup(text):
+        # 添加匹配前的普通文本
+        if start > last_end:
+            rich_text.append({
+                "type": "text",
+                "text": {"content": text[last_end:start]}
+            })
+
+        rich_text.append(node)
+        last_end = end
+
+    # 添加剩余的普通文本
+    if last_end < len(text):
+        remaining_text = text[last_end:]
+        if remaining_text:
+            rich_text.append({
+                "type": "text",
+                "text": {"content": remaining_text}
+            })
+
+    # 如果没有找到任何内容,返回普通文本
+    if not rich_text:
+        rich_text = _plain_rt(text)
+
+    # Notion限制单个文本节点最多2000字符,超长节点拆分为多个相同样式的节点
+    if any(len(node["text"]["content"]) > _MAX_TEXT_CONTENT for node in rich_text):
+        rich_text = [part for node in rich_text for part in _split_text_node(node)]
+
+    return tuple(rich_text)
+
+
 class NotionClient:
     """Notion API 客户端"""
 
@@ -28,6 +246,47 @@ class NotionClient:
         self.integration_token = notion_config.get('integration_token')
         self.parent_page_id = notion_config.get('parent_page_id')
 
+        # 复用TCP/TLS连接的会话;urllib3按Retry-After和指数退避自动重试:
+        # GET 重试 429/5xx 和读超时,POST/PATCH 只重试 429(见 _NotionRetry)
+        self._session = requests.Session()
+        retry = _NotionRetry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True
+        )
+        # 只访问 api.notion.com 一个主机,一个连接池即可;pool_block 让并发推送线程复用已有长连接,
+        # 而不是在池满时临时新建连接、用完即丢
+        self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=_HTTP_POOL_SIZE,
+                                                    pool_block=True, max_retries=retry))
+
+        # 所有请求共享的令牌桶,多个推送线程并发时整体速率不超过Notion限制
+        self._rate_limiter = TokenBucket(_NOTION_REQUESTS_PER_SEC, int(_NOTION_REQUESTS_PER_SEC))
+
+        # 层级页面缓存: (父页面ID, 标题) -> 页面ID,读写都需持有 _page_lock
+        self._page_cache: Dict[Tuple[str, str], str] = {}
+        self._page_lock = threading.Lock()
+        # 发现缓存页面失效并移除的次数,用于判断是否需要重新解析页面层级
+        self._page_evictions = 0
+        # 持久化的层级页面缓存,进程重启后首次推送也无需重新查询年/月/日页面
+        self.page_cache_ttl = notion_config.get('page_cache_ttl', 30 * 24 * 3600)
+        self._page_store = None
+        if notion_config.get('page_cache_enabled'):
+            page_cache_dir = notion_config.get('page_cache_dir', '.notion_cache')
+            self._page_store = diskcache.Cache(page_cache_dir)
+            logger.info(f"Notion页面缓存已启用: {page_cache_dir}")
+        # 子页面列表缓存: 页面ID -> (缓存时间, 子页面列表结果, 子页面标题索引),多个推送线程共享
+        self._children_cache: Dict[str, Tuple[float, Dict[str, Any], Dict[str, str]]] = {}
+        self._children_lock = threading.Lock()
+
+        # API请求头在客户端生命周期内不变,只构建一次
+        self._headers = {
+            "Authorization": f"Bearer {self.integration_token}",
+            "Content-Type": "application/json",
+            "Notion-Version": self.version
+        }
+
         if not self.integration_token:
             logger.warning("Notion集成token未配置")
         if not self.parent_page_id:
@@ -35,29 +294,28 @@ class NotionClient:
 
         logger.info("Notion客户端初始化成功")
 
-    def _get_headers(self) -> Dict[str, str]:
-        """获取API请求头"""
-        return {
-            "Authorization": f"Bearer {self.integration_token}",
-            "Content-Type": "application/json",
-            "Notion-Version": self.version
-        }
+    def _make_request(self, method: str, endpoint: str, data: Dict = None,
+                      params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """发送API请求
 
-    def _make_request(self, method: str, endpoint: str, data: Dict = None) -> Dict[str, Any]:
-        """发送API请求"""
+        Args:
+            method: HTTP方法(GET/POST/PATCH)
+            endpoint: API路径,如 "pages"
+            data: 请求体JSON(GET请求忽略)
+            params: URL查询参数
+        """
         url = f"{self.base_url}/{endpoint}"
-        headers = self._get_headers()
 
-        try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=headers, timeout=30)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=headers, json=data, timeout=30)
-            elif method.upper() == "PATCH":
-                response = requests.patch(url, headers=headers, json=data, timeout=30)
-            else:
-                raise ValueError(f"不支持的HTTP方法: {method}")
+        method = method.upper()
+        if method not in ("GET", "POST", "PATCH"):
+            raise ValueError(f"不支持的HTTP方法: {method}")
 
+        self._rate_limiter.acquire()
+        try:
+            # 请求体用orjson序列化(Content-Type已在请求头中声明为JSON)
+            body = orjson.dumps(data) if data is not None and method != "GET" else None
+            response = self._session.request(method, url, headers=self._headers, params=params,
+                                             data=body, timeout=30)
             response.raise_for_status()
             return {"success": True, "data": response.json()}
 
@@ -72,14 +330,85 @@ class NotionClient:
                 pass
 
             logger.error(f"Notion API请求失败: {error_msg}")
-            return {"success": False, "error": error_msg}
+            status_code = e.response.status_code if getattr(e, 'response', None) is not None else None
+            return {"success": False, "error": error_msg, "status_code": status_code}
 
     def get_page_children(self, page_id: str) -> Dict[str, Any]:
-        """获取页面的子页面"""
-        return self._make_request("GET", f"blocks/{page_id}/children")
+        """获取页面的全部子块(自动翻页),成功结果缓存 _CHILDREN_CACHE_TTL 秒"""
+        now = time.monotonic()
+        with self._children_lock:
+            cached = self._children_cache.get(page_id)
+            if cached and now - cached[0] < _CHILDREN_CACHE_TTL:
+                return cached[1]
+
+        # 按 has_more/next_cursor 翻页取全所有子块,避免子页面较多时漏掉已有页面而重复创建
+        results = []
+        params = {"page_size": _CHILDREN_PAGE_SIZE}
+        while True:
+            page = self._make_request("GET", f"blocks/{page_id}/children", params=params)
+            if not page.get("success"):
+                return page
+
+            results.extend(page["data"].get("results", []))
+            next_cursor = page["data"].get("next_cursor")
+            if not page["data"].get("has_more") or not next_cursor:
+                break
+            params = {"page_size": _CHILDREN_PAGE_SIZE, "start_cursor": next_cursor}
+
+        result = {"success": True, "data": {"results": results, "has_more": False, "next_cursor": None}}
+        title_index = self._build_title_index(result)
+        with self._children_lock:
+            self._children_cache[page_id] = (now, result, title_index)
+        return result
+
+    def _build_title_index(self, children_result: Dict[str, Any]) -> Dict[str, str]:
+        """建立子页面 标题 -> 页面ID 的索引,标题重复时保留第一个"""
+        index = {}
+        for child in children_result["data"].get("results", []):
+            if child.get("type") == "child_page":
+                index.setdefault(self._extract_page_title(child), child["id"])
+        return index
+
+    def _get_title_index(self, page_id: str) -> Tuple[Dict[str, Any], Optional[Dict[str, str]]]:
+        """获取页面的子页面标题索引
+
+        Returns:
+            (子页面列表结果, 标题索引),获取失败时索引为None
+        """
+        children_result = self.get_page_children(page_id)
+        if not children_result.get("success"):
+            return children_result, None
+
+        with self._children_lock:
+            cached = self._children_cache.get(page_id)
+            if cached and cached[1] is children_result:
+                return children_result, cached[2]
+
+        # 缓存已被并发的创建操作清除,直接从结果构建
+        return children_result, self._build_title_index(children_result)
+
+    def _invalidate_children(self, page_id: str):
+        """父页面下新建了子页面,丢弃其子页面列表缓存"""
+        with self._children_lock:
+            self._children_cache.pop(page_id, None)
+
+    def append_block_children(self, block_id: str, blocks: List[Dict]) -> Dict[str, Any]:
+        """向页面/块末尾追加子块,超过单次上限时按 _MAX_BLOCKS_PER_REQUEST 分批顺序追加"""
+        result = {"success": True, "data": {}}
+        for start in range(0, len(blocks), _MAX_BLOCKS_PER_REQUEST):
+            result = self._make_request("PATCH", f"blocks/{block_id}/children",
+                                        {"children": blocks[start:start + _MAX_BLOCKS_PER_REQUEST]})
+            if not result.get("success"):
+                if self._is_dead_page_error(result):
+                    self._forget_page(block_id)
+                return result
+        return result
 
     def create_page(self, parent_id: str, title: str, content_blocks: List[Dict] = None) -> Dict[str, Any]:
-        """创建新页面"""
+        """创建新页面
+
+        超过单次请求上限的块在页面创建后通过 append_block_children 追加
+        """
         data = {
             "parent": {"page_id": parent_id},
             "properties": {
@@ -91,9 +420,22 @@ class NotionClient:
 
         if content_blocks:
             # Notion限制:单次最多100个块
-            data["children"] = content_blocks[:100]
-
-        return self._make_request("POST", "pages", data)
+            data["children"] = content_blocks[:_MAX_BLOCKS_PER_REQUEST]
+
+        result = self._make_request("POST", "pages", data)
+        if not result.get("success") and self._is_dead_page_error(result):
+            # 父页面已被删除或归档:丢弃指向它的缓存,之后重新解析
+            self._forget_page(parent_id)
+        if result.get("success"):
+            self._invalidate_children(parent_id)
+
+            remaining = (content_blocks or [])[_MAX_BLOCKS_PER_REQUEST:]
+            if remaining:
+                append_result = self.append_block_children(result["data"]["id"], remaining)
+                if not append_result.get("success"):
+                    # 页面已创建,只记录错误,避免调用方当作失败重复创建页面
+                    logger.error(f"追加剩余 {len(remaining)} 个块失败: {append_result.get('error')}")
+        return result
 
     def _extract_page_title(self, page_data: Dict) -> str:
         """从页面数据中提取标题"""
@@ -105,95 +447,114 @@ class NotionClient:
         except Exception:
             return ""
 
-    def find_or_create_year_page(self, year: str) -> Optional[str]:
-        """查找或创建年份页面"""
+    @staticmethod
+    def _is_dead_page_error(result: Dict[str, Any]) -> bool:
+        """请求失败是否因为目标页面已被删除(404)或归档"""
+        return result.get("status_code") == 404 or "archived" in (result.get("error") or "")
+
+    def _forget_page(self, page_id: str):
+        """从内存和持久化缓存中移除指向该页面的层级页面记录"""
+        def is_stale(key, value):
+            # 指向该页面的记录,以及以该页面为父页面的下级记录
+            return value == page_id or key[0] == page_id
+
+        with self._page_lock:
+            for key in [key for key, value in self._page_cache.items() if is_stale(key, value)]:
+                del self._page_cache[key]
+                self._invalidate_children(key[0])
+            if self._page_store is not None:
+                for key in list(self._page_store.iterkeys()):
+                    if is_stale(key, self._page_store.get(key)):
+                        self._page_store.delete(key)
+                        self._invalidate_children(key[0])
+            self._page_evictions += 1
+        logger.warning(f"Notion页面 {page_id} 已删除或归档,已移除其缓存")
+
+    def _is_live_page(self, page_id: str) -> bool:
+        """检查页面仍然存在且未归档;请求因其他原因失败时按存在处理,不丢弃缓存"""
+        result = self._make_request("GET", f"pages/{page_id}")
+        if result.get("success"):
+            data = result["data"]
+            return not (data.get("archived") or data.get("in_trash"))
+        return not self._is_dead_page_error(result)
+
+    def _remember_page(self, cache_key: Tuple[str, str], page_id: str):
+        """记录已解析的层级页面ID(内存 + 持久化缓存)"""
+        with self._page_lock:
+            self._page_cache[cache_key] = page_id
+        if self._page_store is not None:
+            self._page_store.set(cache_key, page_id, expire=self.page_cache_ttl)
+
+    def _find_or_create_child_page(self, parent_id: str, title: str,
+                                   page_kind: str, parent_kind: str) -> Optional[str]:
+        """在父页面下查找指定标题的子页面,不存在则创建
+
+        结果按 (父页面ID, 标题) 缓存在内存和磁盘,同一天推送多篇报告或进程重启后不再重复查询层级页面
+
+        Args:
+            parent_id: 父页面ID
+            title: 子页面标题
+            page_kind: 子页面类型名称(用于日志),如"年份"
+            parent_kind: 父页面类型名称(用于日志),如"父"
+        """
+        cache_key = (parent_id, title)
+        with self._page_lock:
+            page_id = self._page_cache.get(cache_key)
+        if page_id:
+            return page_id
+
+        if self._page_store is not None:
+            page_id = self._page_store.get(cache_key)
+            # 持久化缓存可能是之前运行留下的,本进程首次使用时确认页面仍然有效
+            if page_id and self._is_live_page(page_id):
+                with self._page_lock:
+                    self._page_cache[cache_key] = page_id
+                return page_id
+            if page_id:
+                self._forget_page(page_id)
+
         try:
-            # 获取父页面的子页面
-            children_result = self.get_page_children(self.parent_page_id)
-            if not children_result.get("success"):
-                logger.error(f"获取父页面子页面失败: {children_result.get('error')}")
+            # 获取父页面的子页面标题索引
+            children_result, title_index = self._get_title_index(parent_id)
+            if title_index is None:
+                logger.error(f"获取{parent_kind}页面子页面失败: {children_result.get('error')}")
+                if self._is_dead_page_error(children_result):
+                    self._forget_page(parent_id)
                 return None
 
-            # 查找年份页面
-            for child in children_result["data"].get("results", []):
-                if child.get("type") == "child_page":
-                    page_title = self._extract_page_title(child)
-                    if page_title == year:
-                        logger.info(f"找到现有年份页面: {year}")
-                        return child["id"]
-
-            # 创建年份页面
-            logger.info(f"创建年份页面: {year}")
-            create_result = self.create_page(self.parent_page_id, year)
+            # 查找子页面
+            page_id = title_index.get(title)
+            if page_id:
+                logger.info(f"找到现有{page_kind}页面: {title}")
+                self._remember_page(cache_key, page_id)
+                return page_id
+
+            # 创建子页面
+            logger.info(f"创建{page_kind}页面: {title}")
+            create_result = self.create_page(parent_id, title)
             if create_result.get("success"):
-                return create_result["data"]["id"]
+                page_id = create_result["data"]["id"]
+                self._remember_page(cache_key, page_id)
+                return page_id
             else:
-                logger.error(f"创建年份页面失败: {create_result.get('error')}")
+                logger.error(f"创建{page_kind}页面失败: {create_result.get('error')}")
                 return None
 
         except Exception as e:
-            logger.error(f"查找或创建年份页面时出错: {e}")
+            logger.error(f"查找或创建{page_kind}页面时出错: {e}")
             return None
 
+    def find_or_create_year_page(self, year: str) -> Optional[str]:
+        """查找或创建年份页面"""
+        return self._find_or_create_child_page(self.parent_page_id, year, "年份", "父")
+
     def find_or_create_month_page(self, year_page_id: str, month: str) -> Optional[str]:
         """查找或创建月份页面"""
-        try:
-            # 获取年份页面的子页面
-            children_result = self.get_page_children(year_page_id)
-            if not children_result.get("success"):
-                logger.error(f"获取年份页面子页面失败: {children_result.get('error')}")
-                return None
-
-            # 查找月份页面
-            for child in children_result["data"].get("results", []):
-                if child.get("type") == "child_page":
-                    page_title = self._extract_page_title(child)
-                    if page_title == month:
-                        logger.info(f"找到现有月份页面: {month}")
-                        return child["id"]
-
-            # 创建月份页面
-            logger.info(f"创建月份页面: {month}")
-            create_result = self.create_page(year_page_id, month)
-            if create_result.get("success"):
-                return create_result["data"]["id"]
-            else:
-                logger.error(f"创建月份页面失败: {create_result.get('error')}")
-                return None
-
-        except Exception as e:
-            logger.error(f"查找或创建月份页面时出错: {e}")
-            return None
+        return self._find_or_create_child_page(year_page_id, month, "月份", "年份")
 
     def find_or_create_day_page(self, month_page_id: str, day: str) -> Optional[str]:
         """查找或创建日期页面"""
-        try:
-            # 获取月份页面的子页面
-            children_result = self.get_page_children(month_page_id)
-            if not children_result.get("success"):
-                logger.error(f"获取月份页面子页面失败: {children_result.get('error')}")
-                return None
-
-            # 查找日期页面
-            for child in children_result["data"].get("results", []):
-                if child.get("type") == "child_page":
-                    page_title = self._extract_page_title(child)
-                    if page_title == day:
-                        logger.info(f"找到现有日期页面: {day}")
-                        return child["id"]
-
-            # 创建日期页面
-            logger.info(f"创建日期页面: {day}")
-            create_result = self.create_page(month_page_id, day)
-            if create_result.get("success"):
-                return create_result["data"]["id"]
-            else:
-                logger.error(f"创建日期页面失败: {create_result.get('error')}")
-                return None
-
-        except Exception as e:
-            logger.error(f"查找或创建日期页面时出错: {e}")
-            return None
+        return self._find_or_create_child_page(month_page_id, day, "日期", "月份")
 
     def create_daily_learning_page(self, report_date: datetime) -> Optional[str]:
         """创建每日学习页面,使用年/月/日层级结构
@@ -204,10 +565,18 @@ class NotionClient:
         Returns:
             日期页面ID,失败返回None
         """
+        evictions = self._page_evictions
+        day_page_id = self._resolve_daily_learning_page(report_date)
+        if not day_page_id and self._page_evictions != evictions:
+            # 解析过程中发现缓存的层级页面已删除或归档,缓存已移除,重新解析一次
+            logger.info("层级页面缓存失效,重新解析每日学习页面")
+            day_page_id = self._resolve_daily_learning_page(report_date)
+        return day_page_id
+
+    def _resolve_daily_learning_page(self, report_date: datetime) -> Optional[str]:
+        """依次查找或创建年/月/日页面,返回日期页面ID,失败返回None"""
         try:
-            year = str(report_date.year)
-            month = f"{report_date.month:02d}月"
-            day = f"{report_date.day:02d}日"
+            year, month, day = self._date_titles(report_date)
 
             logger.info(f"创建/查找每日学习页面: {year}/{month}/{day}")
 
@@ -233,63 +602,156 @@ class NotionClient:
             logger.error(f"创建每日学习页面时出错: {e}")
             return None
 
+    @staticmethod
+    def _date_titles(report_date: datetime) -> Tuple[str, str, str]:
+        """日期对应的年/月/日页面标题"""
+        return str(report_date.year), f"{report_date.month:02d}月", f"{report_date.day:02d}日"
+
     def _parse_rich_text(self, text: str) -> List[Dict]:
-        """解析文本中的链接和Markdown格式,支持链接和加粗"""
-        if not text:
-            return [{"type": "text", "text": {"content": ""}}]
-
-        rich_text = []
-        # 匹配Markdown链接: [文本](URL)
-        # 匹配Markdown加粗: **文本**
-        # 组合模式,按顺序处理
-        combined_pattern = r'(\[([^\]]+)\]\((https?://[^)]+)\))|(\*\*([^*]+)\*\*)'
-        last_end = 0
-
-        for match in re.finditer(combined_pattern, text):
-            # 添加匹配前的普通文本
-            if match.start() > last_end:
-                before_text = text[last_end:match.start()]
-                if before_text:
-                    rich_text.append({
-                        "type": "text",
-                        "text": {"content": before_text}
-                    })
-
-            # 判断是链接还是加粗
-            if match.group(1):  # 链接
-                link_text = match.group(2)
-                link_url = match.group(3)
-                rich_text.append({
-                    "type": "text",
-                    "text": {
-                        "content": link_text,
-                        "link": {"url": link_url}
+        """解析文本中的链接和Markdown格式,支持链接和加粗
+
+        解析结果按文本缓存;返回列表的浅拷贝,节点字典在报告间共享,只用于序列化,不应修改
+        """
+        return list(_parse_rich_text_cached(text))
+
+    @staticmethod
+    def _toggle_block(title: str, children: List[Dict]) -> Dict:
+        """构建带加粗标题的折叠块"""
+        return {
+            "object": "block",
+            "type": "toggle",
+            "toggle": {
+                "rich_text": [{"type": "text", "text": {"content": title}, "annotations": _BOLD}],
+                "children": children,
+                "color": "default"
+            }
+        }
+
+    @staticmethod
+    def _maybe_quote_block(core_thesis: str) -> Optional[Dict]:
+        """构建"核心论点"引用块,没有内容时返回None"""
+        if not core_thesis:
+            return None
+
+        return {
+            "object": "block",
+            "type": "quote",
+            "quote": {
+                "rich_text": _plain_rt(core_thesis),
+                "color": "blue_background"
+            }
+        }
+
+    @staticmethod
+    def _maybe_insight_block(primary_insight: str) -> Optional[Dict]:
+        """构建"核心洞察"标注块,没有内容时返回None"""
+        if not primary_insight:
+            return None
+
+        return {
+            "object": "block",
+            "type": "callout",
+            "callout": {
+                "rich_text": _plain_rt(primary_insight),
+                "icon": {"emoji": "💡"},
+                "color": "yellow_background"
+            }
+        }
+
+    def _maybe_deconstruction_block(self, deconstruction: Dict[str, Any]) -> Optional[Dict]:
+        """构建"解构分析"折叠块,没有可展示内容时返回None"""
+        post_type = deconstruction.get('post_type', '')
+        underlying = deconstruction.get('underlying_assumption', '')
+        if not (post_type or underlying):
+            return None
+
+        children = [
+            _para([
+                {"type": "text", "text": {"content": label}, "annotations": _BOLD},
+                {"type": "text", "text": {"content": value}}
+            ])
+            for label, value in (("类型: ", post_type), ("潜在假设: ", underlying))
+            if value
+        ]
+
+        return self._toggle_block("🔍 解构分析", children)
+
+    def _maybe_technique_block(self, technique_analysis: List[Dict[str, Any]]) -> Optional[Dict]:
+        """构建"表达技巧"折叠块,没有可展示内容时返回None"""
+        if not technique_analysis:
+            return None
+
+        children = []
+        for tech in technique_analysis:
+            tech_name = tech.get('technique_name', '')
+            tech_suggestion = tech.get('application_suggestion', '')
+
+            if not (tech_name and tech_suggestion):
+                continue
+
+            children.extend((
+                # 技巧名称(加粗蓝色)
+                _para([
+                    {"type": "text", "text": {"content": tech_name}, "annotations": {"bold": True, "color": "blue"}}
+                ]),
+                # 技巧建议(支持markdown格式)
+                _para(self._parse_rich_text(_safe_truncate(tech_suggestion, 1500)))
+            ))
+
+            # 添加分隔
+            if tech != technique_analysis[-1]:
+                children.append(_DIVIDER_BLOCK)
+
+        return self._toggle_block("✨ 表达技巧", children) if children else None
+
+    def _maybe_reconstruction_block(self, reconstruction: List[Dict[str, Any]]) -> Optional[Dict]:
+        """构建"重构作品"折叠块,没有可展示内容时返回None"""
+        if not reconstruction:
+            return None
+
+        children = []
+        for recon in reconstruction:
+            style = recon.get('style', '')
+            content = recon.get('content', '')
+            rationale = recon.get('rationale', '')
+
+            if not (style and content):
+                continue
+
+            children.extend((
+                # 风格标题
+                {
+                    "object": "block",
+                    "type": "heading_3",
+                    "heading_3": {
+                        "rich_text": _plain_rt(style),
+                        "color": "green"
                     }
-                })
-            elif match.group(4):  # 加粗
-                bold_text = match.group(5)
-                rich_text.append({
-                    "type": "text",
-                    "text": {"content": bold_text},
-                    "annotations": {"bold": True}
-                })
-
-            last_end = match.end()
-
-        # 添加剩余的普通文本
-        if last_end < len(text):
-            remaining_text = text[last_end:]
-            if remaining_text:
-                rich_text.append({
-                    "type": "text",
-                    "text": {"content": remaining_text}
-                })
-
-        # 如果没有找到任何内容,返回普通文本
-        if not rich_text:
-            rich_text = [{"type": "text", "text": {"content": text}}]
-
-        return rich_text
+                },
+                # 重构内容 - 使用callout块,有背景色且支持自动换行和markdown格式
+                {
+                    "object": "block",
+                    "type": "callout",
+                    "callout": {
+                        "rich_text": self._parse_rich_text(_safe_truncate(content, 1900)),
+                        "icon": {"emoji": "✍️"},
+                        "color": "gray_background"
+                    }
+                }
+            ))
+
+            # 思路说明
+            if rationale:
+                children.append(_para([
+                    {"type": "text", "text": {"content": "思路: "}, "annotations": {"italic": True, "color": "gray"}},
+                    {"type": "text", "text": {"content": _safe_truncate(rationale, 900)}, "annotations": _ITALIC}
+                ]))
+
+            # 添加分隔(如果不是最后一个)
+            if recon != reconstruction[-1]:
+                children.append(_DIVIDER_BLOCK)
+
+        return self._toggle_block("✍️ 重构作品", children) if children else None
 
     def format_and_push_report(self, report_data: Dict[str, Any], parent_page_id: str) -> Dict[str, Any]:
         """格式化并推送报告到Notion,使用优美的排版
@@ -309,7 +771,7 @@ class NotionClient:
         try:
             analysis = report_data.get('analysis_report', {})
             if isinstance(analysis, str):
-                analysis = json.loads(analysis)
+                analysis = orjson.loads(analysis)
 
             # 提取核心信息
             deconstruction = analysis.get('deconstruction', {})
@@ -324,7 +786,7 @@ class NotionClient:
             page_title = analysis.get('page_title')
             if not page_title:
                 core_thesis = deconstruction.get('core_thesis', '学习笔记')
-                page_title = f"📝 {core_thesis[:40]} - {author}"
+                page_title = f"📝 {_safe_truncate(core_thesis, 40)} - {author}"
             else:
                 # 如果有LLM生成的title,在前面加个图标
                 page_title = f"📝 {page_title}"
@@ -333,17 +795,15 @@ class NotionClient:
             core_thesis = deconstruction.get('core_thesis', '')
 
             # 构建Notion blocks
-            blocks = []
-
             # 1. 原文引用(Callout块,带链接)
-            original_text = report_data.get('original_content', '')[:1900]
+            original_text = _safe_truncate(report_data.get('original_content', ''), 1900)
             original_url = report_data.get('original_url', '')
 
             # 如果有URL,在原文末尾添加链接
             if original_url:
                 original_text += f"\n\n[查看原文]({original_url})"
 
-            blocks.append({
+            blocks = [{
                 "object": "block",
                 "type": "callout",
                 "callout": {
@@ -351,203 +811,32 @@ class NotionClient:
                     "icon": {"emoji": "📌"},
                     "color": "gray_background"
                 }
-            })
-
-            # 2. 核心论点(Quote块)
-            if core_thesis:
-                blocks.append({
-                    "object": "block",
-                    "type": "quote",
-                    "quote": {
-                        "rich_text": [{"type": "text", "text": {"content": core_thesis}}],
-                        "color": "blue_background"
-                    }
-                })
-
-            # 3. 解构分析(Toggle块)
-            deconstruction_children = []
-
-            post_type = deconstruction.get('post_type', '')
-            if post_type:
-                deconstruction_children.append({
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [
-                            {"type": "text", "text": {"content": "类型: "}, "annotations": {"bold": True}},
-                            {"type": "text", "text": {"content": post_type}}
-                        ]
-                    }
-                })
-
-            underlying = deconstruction.get('underlying_assumption', '')
-            if underlying:
-                deconstruction_children.append({
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [
-                            {"type": "text", "text": {"content": "潜在假设: "}, "annotations": {"bold": True}},
-                            {"type": "text", "text": {"content": underlying}}
-                        ]
-                    }
-                })
-
-            if deconstruction_children:
-                blocks.append({
-                    "object": "block",
-                    "type": "toggle",
-                    "toggle": {
-                        "rich_text": [{"type": "text", "text": {"content": "🔍 解构分析"}, "annotations": {"bold": True}}],
-                        "children": deconstruction_children,
-                        "color": "default"
-                    }
-                })
-
-            # 4. 核心洞察(Callout块)
-            primary_insight = internalization.get('primary_insight', '')
-            if primary_insight:
-                blocks.append({
-                    "object": "block",
-                    "type": "callout",
-                    "callout": {
-                        "rich_text": [{"type": "text", "text": {"content": primary_insight}}],
-                        "icon": {"emoji": "💡"},
-                        "color": "yellow_background"
-                    }
-                })
-
-            # 5. 表达技巧(Toggle块)
-            technique_analysis = internalization.get('technique_analysis', [])
-            if technique_analysis:
-                technique_children = []
-
-                for tech in technique_analysis:
-                    tech_name = tech.get('technique_name', '')
-                    tech_suggestion = tech.get('application_suggestion', '')
-
-                    if tech_name and tech_suggestion:
-                        # 技巧名称(加粗蓝色)
-                        technique_children.append({
-                            "object": "block",
-                            "type": "paragraph",
-                            "paragraph": {
-                                "rich_text": [
-                                    {"type": "text", "text": {"content": tech_name}, "annotations": {"bold": True, "color": "blue"}}
-                                ]
-                            }
-                        })
-
-                        # 技巧建议(支持markdown格式)
-                        technique_children.append({
-                            "object": "block",
-                            "type": "paragraph",
-                            "paragraph": {
-                                "rich_text": self._parse_rich_text(tech_suggestion[:1500])
-                            }
-                        })
-
-                        # 添加分隔
-                        if tech != technique_analysis[-1]:
-                            technique_children.append({
-                                "object": "block",
-                                "type": "divider",
-                                "divider": {}
-                            })
-
-                if technique_children:
-                    blocks.append({
-                        "object": "block",
-                        "type": "toggle",
-                        "toggle": {
-                            "rich_text": [{"type": "text", "text": {"content": "✨ 表达技巧"}, "annotations": {"bold": True}}],
-                            "children": technique_children,
-                            "color": "default"
-                        }
-                    })
-
-            # 6. 重构作品(Toggle块)
-            if reconstruction:
-                reconstruction_children = []
-
-                for recon in reconstruction:
-                    style = recon.get('style', '')
-                    content = recon.get('content', '')
-                    rationale = recon.get('rationale', '')
-
-                    if style and content:
-                        # 风格标题
-                        reconstruction_children.append({
-                            "object": "block",
-                            "type": "heading_3",
-                            "heading_3": {
-                                "rich_text": [{"type": "text", "text": {"content": style}}],
-                                "color": "green"
-                            }
-                        })
-
-                        # 重构内容 - 使用callout块,有背景色且支持自动换行和markdown格式
-                        reconstruction_children.append({
-                            "object": "block",
-                            "type": "callout",
-                            "callout": {
-                                "rich_text": self._parse_rich_text(content[:1900]),
-                                "icon": {"emoji": "✍️"},
-                                "color": "gray_background"
-                            }
-                        })
-
-                        # 思路说明
-                        if rationale:
-                            reconstruction_children.append({
-                                "object": "block",
-                                "type": "paragraph",
-                                "paragraph": {
-                                    "rich_text": [
-                                        {"type": "text", "text": {"content": "思路: "}, "annotations": {"italic": True, "color": "gray"}},
-                                        {"type": "text", "text": {"content": rationale[:900]}, "annotations": {"italic": True}}
-                                    ]
-                                }
-                            })
-
-                        # 添加分隔(如果不是最后一个)
-                        if recon != reconstruction[-1]:
-                            reconstruction_children.append({
-                                "object": "block",
-                                "type": "divider",
-                                "divider": {}
-                            })
-
-                if reconstruction_children:
-                    blocks.append({
-                        "object": "block",
-                        "type": "toggle",
-                        "toggle": {
-                            "rich_text": [{"type": "text", "text": {"content": "✍️ 重构作品"}, "annotations": {"bold": True}}],
-                            "children": reconstruction_children,
-                            "color": "default"
-                        }
-                    })
+            }]
+
+            # 2-6. 各分析板块,缺少内容的板块直接跳过
+            blocks.extend(block for block in (
+                # 2. 核心论点(Quote块)
+                self._maybe_quote_block(core_thesis),
+                # 3. 解构分析(Toggle块)
+                self._maybe_deconstruction_block(deconstruction),
+                # 4. 核心洞察(Callout块)
+                self._maybe_insight_block(internalization.get('primary_insight', '')),
+                # 5. 表达技巧(Toggle块)
+                self._maybe_technique_block(internalization.get('technique_analysis', [])),
+                # 6. 重构作品(Toggle块)
+                self._maybe_reconstruction_block(reconstruction)
+            ) if block)
 
             # 7. 元信息(分隔线 + 灰色文本)
-            blocks.append({
-                "object": "block",
-                "type": "divider",
-                "divider": {}
-            })
-
             meta_info = f"📱 {platform} | 👤 {author}"
 
-            blocks.append({
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{"type": "text", "text": {"content": meta_info}, "annotations": {"color": "gray"}}]
-                }
-            })
+            blocks.extend((
+                _DIVIDER_BLOCK,
+                _para([{"type": "text", "text": {"content": meta_info}, "annotations": {"color": "gray"}}])
+            ))
 
-            # 创建页面(限制为100个块,但使用了Toggle所以一般不会超)
-            create_result = self.create_page(parent_page_id, page_title, blocks[:100])
+            # 创建页面(超过100个块的部分由create_page分批追加)
+            create_result = self.create_page(parent_page_id, page_title, blocks)
 
             if create_result.get("success"):
                 page_id = create_result["data"]["id"]
@@ -566,3 +855,46 @@ class NotionClient:
         except Exception as e:
             logger.error(f"格式化并推送报告时出错: {e}", exc_info=True)
             return {"success": False, "error": str(e)}
+
+    def push_reports_concurrent(self, reports: List[Dict[str, Any]], parent_page_id: str,
+                                max_concurrency: int = 3,
+                                on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None
+                                ) -> List[Dict[str, Any]]:
+        """并发推送多篇报告到同一父页面
+
+        请求速率由客户端共享的令牌桶控制,并发只用于重叠网络延迟。报告按 reports 的顺序提交,
+        页面在Notion中按创建完成的先后排列,同一时间在途的几篇之间顺序不固定
+
+        Args:
+            reports: 报告列表,字段同 format_and_push_report
+            parent_page_id: 父页面ID(日期页面)
+            max_concurrency: 最大并发推送数
+            on_result: 每完成一篇立即回调 on_result(索引, 推送结果),在调用线程中执行
+
+        Returns:
+            与 reports 一一对应的推送结果列表
+        """
+        results: List[Dict[str, Any]] = [None] * len(reports)
+        if not reports:
+            return results
+
+        def push_one(i, report):
+            """推送单个报告"""
+            logger.info(f"推送报告 {i+1}/{len(reports)}: {report['source_platform']}/{report['source_post_id']}")
+            return self.format_and_push_report(report, parent_page_id)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(reports)))) as executor:
+            futures = {executor.submit(push_one, i, report): i for i, report in enumerate(reports)}
+
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    logger.error(f"推送报告时出错: {e}")
+                    results[i] = {"success": False, "error": str(e)}
+
+                if on_result:
+                    on_result(i, results[i])
+
+        return results
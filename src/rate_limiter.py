@@ -0,0 +1,149 @@
+"""
+限速工具模块
+提供线程安全的令牌桶和自适应并发限制器,在发起API请求前主动限速,避免触发服务端429
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """线程安全的令牌桶限速器
+
+    令牌以 rate_per_sec 的速度持续补充,桶内最多存放 capacity 个令牌。
+    每次请求前调用 acquire() 取走一个令牌,令牌不足时阻塞等待。
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: int = 1):
+        """初始化令牌桶
+
+        Args:
+            rate_per_sec: 每秒补充的令牌数,<=0 表示不限速
+            capacity: 桶容量(允许的最大突发请求数)
+        """
+        self.rate = rate_per_sec
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_delay(cls, delay: float, capacity: int = 1) -> 'TokenBucket':
+        """按"两次请求间隔秒数"创建令牌桶,delay<=0 表示不限速"""
+        return cls(1.0 / delay if delay and delay > 0 else 0, capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def reserve(self) -> float:
+        """预约一个令牌并返回需要等待的秒数,不阻塞
+
+        供 asyncio 调用方配合 asyncio.sleep 使用;令牌可以预支为负数,
+        之后的调用方会相应等待更久,整体速率不变
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self._cond:
+            self._refill()
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        """获取一个令牌,令牌不足时阻塞到令牌补充为止"""
+        if self.rate <= 0:
+            return
+
+        with self._cond:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                # 计算下一个令牌到达所需时间,等待期间释放锁
+                self._cond.wait((1 - self._tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """线程安全的自适应并发限制器(AIMD)+ 熔断
+
+    成功时并发上限缓慢回升(每次 +0.25),在 window 秒内连续出现
+    failure_threshold 次限流/服务端错误(429、5xx)时并发上限减半,
+    并熔断 cooldown 秒,期间所有调用方暂停发起新请求,避免重试风暴。
+    """
+
+    def __init__(self, max_concurrency: int, failure_threshold: int = 3,
+                 window: float = 30.0, cooldown: float = 10.0):
+        """初始化自适应限制器
+
+        Args:
+            max_concurrency: 并发上限的最大值(即初始值)
+            failure_threshold: 触发熔断的连续失败次数
+            window: 统计连续失败的时间窗口(秒)
+            cooldown: 熔断持续时间(秒)
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = float(self.max_concurrency)
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.cooldown = cooldown
+        self._in_flight = 0
+        self._failures = []
+        self._open_until = 0.0
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def _is_overload(status_code) -> bool:
+        """429 和 5xx 视为服务端过载,其他错误不影响并发"""
+        return status_code is not None and (status_code == 429 or status_code >= 500)
+
+    def acquire(self):
+        """获取一个并发名额,熔断期间或名额已满时阻塞"""
+        with self._cond:
+            while True:
+                wait = self._open_until - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self._in_flight < int(self.concurrency):
+                    self._in_flight += 1
+                    return
+                else:
+                    self._cond.wait()
+
+    def release(self):
+        """归还并发名额"""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        """请求成功:清空失败记录,并发上限加性回升"""
+        with self._cond:
+            self._failures.clear()
+            self.concurrency = min(self.max_concurrency, self.concurrency + 0.25)
+            self._cond.notify_all()
+
+    def on_failure(self, status_code=None):
+        """请求失败:连续过载时并发上限减半并熔断
+
+        Args:
+            status_code: HTTP状态码,非429/5xx的失败(如返回内容无法解析)不计入
+        """
+        if not self._is_overload(status_code):
+            return
+
+        with self._cond:
+            now = time.monotonic()
+            self._failures = [t for t in self._failures if now - t <= self.window]
+            self._failures.append(now)
+
+            if len(self._failures) >= self.failure_threshold:
+                self.concurrency = max(1.0, float(int(self.concurrency) // 2))
+                self._open_until = now + self.cooldown
+                self._failures.clear()
+                logger.warning(f"连续 {self.failure_threshold} 次限流/服务端错误,熔断 {self.cooldown} 秒,"
+                               f"并发上限降至 {int(self.concurrency)}")
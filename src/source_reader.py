@@ -3,17 +3,102 @@
 从X和即刻数据库中读取未处理的帖子
 """
 import logging
+import threading
+import time
 import pymysql
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Dict, Any, List
+from dbutils.pooled_db import PooledDB
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# 平台名称(用于日志)
+_PLATFORM_NAMES = {'X': 'X', 'Jike': '即刻'}
+# VLM图片解读缓存的有效期(秒)和最大条目数
+_INTERP_CACHE_TTL = 300.0
+_INTERP_CACHE_MAX = 10000
+# 批量查询VLM图片解读时每条IN查询的最大ID数
+_IN_QUERY_CHUNK_SIZE = 500
+# 源帖子按 (created_at, id) 键集分页查询时的每页帖子数
+_SOURCE_PAGE_SIZE = 1000
+# 源库上推荐建立的索引 (表名, 索引名),见 migrations/001_source_reader_indexes.sql
+_EXPECTED_INDEXES = {
+    'X': (('twitter_posts', 'idx_created_id'), ('post_insights', 'idx_post_status')),
+    'Jike': (('jk_posts', 'idx_created_id'), ('postprocessing', 'idx_post_status')),
+}
+
 
 class SourceReader:
     """源数据读取器,从X和即刻数据库读取未处理的帖子"""
 
+    # 查询 twitter_posts 和 post_insights 表
+    # 只获取有完整分析的帖子;VLM图片解读较长,过滤掉已处理帖子后再单独查询。
+    # 先在子查询中按帖子分页,再关联 post_insights(一个帖子可能有多条分析),
+    # 保证每页 LIMIT 的是不同的帖子;最后两列 created_at 和原始 id 作为分页键
+    _SQL_X_POSTS = """
+    SELECT
+        CAST(p.id AS CHAR) AS id,
+        p.post_url,
+        p.post_content,
+        p.published_at,
+        p.media_urls,
+        p.user_id,
+        pi.summary,
+        pi.tag,
+        pi.content_type,
+        p.created_at,
+        p.id AS key_id
+    FROM (
+        SELECT p.id, p.post_url, p.post_content, p.published_at, p.media_urls, u.user_id, p.created_at
+        FROM twitter_posts p
+        JOIN twitter_users u ON p.user_table_id = u.id
+        WHERE p.created_at >= %s{keyset_filter}{processed_filter}
+        ORDER BY p.created_at, p.id
+        LIMIT %s
+    ) p
+    LEFT JOIN post_insights pi ON p.id = pi.post_id AND pi.status = 'completed'
+    ORDER BY p.created_at, p.id
+    """
+
+    # 查询 jk_posts 和 jk_profiles 表,postprocessing 中的图片解读过滤后再单独查询;
+    # 最后两列 created_at 和原始 id 作为分页键
+    _SQL_JIKE_POSTS = """
+    SELECT
+        CAST(p.id AS CHAR) AS id,
+        p.link,
+        p.title,
+        p.summary,
+        p.published_at,
+        prof.nickname,
+        prof.jike_user_id,
+        p.created_at,
+        p.id AS key_id
+    FROM jk_posts p
+    JOIN jk_profiles prof ON p.profile_id = prof.id
+    WHERE p.created_at >= %s{keyset_filter}{processed_filter}
+    ORDER BY p.created_at, p.id
+    LIMIT %s
+    """
+
+    # VLM图片解读按ID批量查询,{placeholders} 处填入IN列表占位符
+    _SQL_INTERP_X_TMPL = """
+    SELECT CAST(pi.post_id AS CHAR) AS post_id, pi.interpretation
+    FROM post_insights pi
+    WHERE pi.post_id IN ({placeholders})
+      AND pi.status = 'completed'
+      AND pi.interpretation IS NOT NULL
+    """
+
+    _SQL_INTERP_JIKE_TMPL = """
+    SELECT CAST(pp.post_id AS CHAR) AS post_id, pp.interpretation_text
+    FROM postprocessing pp
+    WHERE pp.post_id IN ({placeholders})
+      AND pp.status = 'success'
+      AND pp.interpretation_text IS NOT NULL
+    """
+
     def __init__(self, config, learning_db_manager):
         """初始化源数据读取器
 
@@ -28,6 +113,21 @@ class SourceReader:
         self._x_config = None
         self._jike_config = None
 
+        # 连接池同样延迟创建,多个线程共享
+        self._x_pool = None
+        self._jike_pool = None
+        self._pool_lock = threading.Lock()
+
+        # VLM图片解读缓存: (平台, 帖子ID) -> (缓存时间, 解读内容或None)
+        self._interp_cache: Dict[Tuple[str, str], Tuple[float, Optional[str]]] = {}
+        self._interp_lock = threading.Lock()
+
+        # 已检查过源库索引的平台
+        self._indexes_checked = set()
+
+        # 跨库排除已处理帖子失败(如没有学习库权限)的平台,之后改用分步查询
+        self._anti_join_disabled = set()
+
     def _ensure_x_config(self):
         """确保X数据库配置已加载"""
         if self._x_config is None:
@@ -50,12 +150,42 @@ class SourceReader:
         """获取即刻数据库配置"""
         return self._ensure_jike_config()
 
+    @staticmethod
+    def _create_pool(db_config: Dict[str, Any]) -> PooledDB:
+        """创建源数据库连接池,游标默认返回字典行"""
+        return PooledDB(
+            creator=pymysql,
+            mincached=2,
+            maxcached=10,
+            maxconnections=20,
+            blocking=True,
+            ping=1,
+            cursorclass=pymysql.cursors.DictCursor,
+            **db_config
+        )
+
+    def _get_x_pool(self) -> PooledDB:
+        """获取X数据库连接池(线程安全的延迟初始化)"""
+        if self._x_pool is None:
+            with self._pool_lock:
+                if self._x_pool is None:
+                    self._x_pool = self._create_pool(self.x_config)
+        return self._x_pool
+
+    def _get_jike_pool(self) -> PooledDB:
+        """获取即刻数据库连接池(线程安全的延迟初始化)"""
+        if self._jike_pool is None:
+            with self._pool_lock:
+                if self._jike_pool is None:
+                    self._jike_pool = self._create_pool(self.jike_config)
+        return self._jike_pool
+
     @contextmanager
     def _get_x_connection(self):
-        """获取X数据库连接"""
+        """获取X数据库连接(close() 将连接归还连接池)"""
         conn = None
         try:
-            conn = pymysql.connect(**self.x_config)
+            conn = self._get_x_pool().connection()
             yield conn
         except Exception as e:
             logger.error(f"X数据库连接失败: {e}")
@@ -66,10 +196,10 @@ class SourceReader:
 
     @contextmanager
     def _get_jike_connection(self):
-        """获取即刻数据库连接"""
+        """获取即刻数据库连接(close() 将连接归还连接池)"""
         conn = None
         try:
-            conn = pymysql.connect(**self.jike_config)
+            conn = self._get_jike_pool().connection()
             yield conn
         except Exception as e:
             logger.error(f"即刻数据库连接失败: {e}")
@@ -78,6 +208,132 @@ class SourceReader:
             if conn:
                 conn.close()
 
+    def _check_indexes(self, conn, platform: str):
+        """首次查询某个平台时检查源库是否已建推荐索引,缺失时输出提示(每个平台只检查一次)"""
+        if platform in self._indexes_checked:
+            return
+        self._indexes_checked.add(platform)
+
+        source_name = _PLATFORM_NAMES.get(platform, platform)
+        try:
+            cursor = conn.cursor()
+            for table, index_name in _EXPECTED_INDEXES[platform]:
+                cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index_name,))
+                if not cursor.fetchall():
+                    logger.info(f"{source_name}源库表 {table} 缺少索引 {index_name},"
+                                f"建议执行 migrations/001_source_reader_indexes.sql")
+        except Exception as e:
+            logger.warning(f"检查{source_name}源库索引失败: {e}")
+
+    def _needs_processed_lookup(self, platform: str, db_config: Dict[str, Any]) -> bool:
+        """该平台是否无法在SQL中排除已处理帖子,需要到学习库分步查询"""
+        return (platform in self._anti_join_disabled
+                or self.learning_db.get_processed_post_ids_sql_fragment(platform, db_config) is None)
+
+    def _execute_unprocessed_query(self, cursor, sql_template: str, cutoff: datetime,
+                                   keyset: Optional[Tuple[datetime, Any]],
+                                   platform: str, db_config: Dict[str, Any]) -> bool:
+        """执行一页源帖子查询,能跨库反连接时在SQL中直接排除已处理的帖子
+
+        Args:
+            cursor: 源数据库游标
+            sql_template: 带 {keyset_filter} 和 {processed_filter} 占位的查询SQL
+            cutoff: 最早的帖子创建时间
+            keyset: 上一页最后一个帖子的 (created_at, id),第一页为None
+            platform: 平台名称 ('X' 或 'Jike')
+            db_config: 源数据库连接配置
+
+        Returns:
+            是否已在SQL中排除已处理的帖子
+        """
+        keyset_filter, params = '', (cutoff,)
+        if keyset:
+            keyset_filter = ' AND (p.created_at > %s OR (p.created_at = %s AND p.id > %s))'
+            params += (keyset[0], keyset[0], keyset[1])
+
+        fragment = None
+        if platform not in self._anti_join_disabled:
+            fragment = self.learning_db.get_processed_post_ids_sql_fragment(platform, db_config)
+
+        if fragment:
+            filter_sql, filter_params = fragment
+            try:
+                cursor.execute(sql_template.format(keyset_filter=keyset_filter, processed_filter=filter_sql),
+                               params + filter_params + (_SOURCE_PAGE_SIZE,))
+                return True
+            except pymysql.err.MySQLError as e:
+                logger.warning(f"{platform}跨库排除已处理帖子失败,改用分步查询: {e}")
+                self._anti_join_disabled.add(platform)
+
+        cursor.execute(sql_template.format(keyset_filter=keyset_filter, processed_filter=''),
+                       params + (_SOURCE_PAGE_SIZE,))
+        return False
+
+    def _iter_unprocessed_rows(self, conn, sql_template: str, cutoff: datetime,
+                               platform: str, db_config: Dict[str, Any]) -> Iterator[tuple]:
+        """查询源帖子,逐行产出未处理帖子的元组行(按SQL列顺序,第一列为字符串帖子ID,
+        最后两列为创建时间和原始帖子ID,即分页键)
+
+        按 (created_at, id) 键集分页,每页 _SOURCE_PAGE_SIZE 个帖子,直到取到不满一页为止,
+        帖子再多也不会被截断。能在SQL中排除已处理帖子时,用服务端游标(SSCursor)边读边产出,
+        不在客户端缓存整页结果;否则每页取回后到学习库批量检查,再产出未处理的行
+
+        Args:
+            conn: 源数据库连接,所有分页查询都复用它
+            sql_template: 带 {keyset_filter} 和 {processed_filter} 占位的查询SQL
+            cutoff: 最早的帖子创建时间
+            platform: 平台名称 ('X' 或 'Jike')
+            db_config: 源数据库连接配置
+        """
+        keyset = None
+        while True:
+            cursor = conn.cursor(pymysql.cursors.SSCursor)
+            row_count, last_row = 0, None
+            try:
+                if self._execute_unprocessed_query(cursor, sql_template, cutoff, keyset, platform, db_config):
+                    for last_row in self._distinct_rows(cursor):
+                        row_count += 1
+                        yield last_row
+                    rows = None
+                else:
+                    rows = list(self._distinct_rows(cursor))
+            finally:
+                # 关闭时读完剩余行,连接复用或归还连接池时处于干净状态
+                cursor.close()
+
+            if rows:
+                row_count, last_row = len(rows), rows[-1]
+                yield from self._exclude_processed(rows, platform)
+
+            if row_count < _SOURCE_PAGE_SIZE:
+                return
+            # 分页键使用原始类型的 created_at 和 id,与列直接比较
+            keyset = (last_row[-2], last_row[-1])
+
+    @staticmethod
+    def _distinct_rows(rows) -> Iterator[tuple]:
+        """跳过同一帖子因一对多关联产生的重复行(按分页键排序,重复行相邻),保留第一行"""
+        last_key = None
+        for row in rows:
+            if row[-1] != last_key:
+                last_key = row[-1]
+                yield row
+
+    def _exclude_processed(self, rows: List[tuple], platform: str) -> Iterator[tuple]:
+        """未能在SQL中排除时,到学习库批量检查一页帖子,产出其中未处理的行"""
+        source_name = _PLATFORM_NAMES.get(platform, platform)
+        logger.info(f"从{source_name}数据库查询到 {len(rows)} 个帖子")
+
+        post_ids = [row[0] for row in rows]
+        logger.info(f"批量检查 {len(post_ids)} 个帖子的处理状态...")
+        processed_ids = self.learning_db.get_processed_post_ids(platform, post_ids)
+        logger.info(f"其中 {len(processed_ids)} 个已处理")
+
+        # 过滤掉已处理的帖子
+        for post_id, row in zip(post_ids, rows):
+            if post_id not in processed_ids:
+                yield row
+
     def get_unprocessed_x_posts(self, days_back: int = 1) -> List[Dict[str, Any]]:
         """从X数据库获取未处理的帖子
 
@@ -90,62 +346,31 @@ class SourceReader:
         try:
             logger.info(f"开始从X数据库查询最近 {days_back} 天的帖子...")
 
+            # 帖子分页查询和图片解读查询复用同一个连接
             with self._get_x_connection() as conn:
-                cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-                # 查询 twitter_posts 和 post_insights 表
-                # 只获取有完整分析的帖子
-                sql = """
-                SELECT
-                    p.id,
-                    p.post_url,
-                    p.post_content,
-                    p.published_at,
-                    p.media_urls,
-                    u.user_id,
-                    pi.summary,
-                    pi.tag,
-                    pi.content_type,
-                    pi.interpretation
-                FROM twitter_posts p
-                JOIN twitter_users u ON p.user_table_id = u.id
-                LEFT JOIN post_insights pi ON p.id = pi.post_id AND pi.status = 'completed'
-                WHERE p.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                ORDER BY p.published_at DESC
-                LIMIT 1000
-                """
-
-                cursor.execute(sql, (days_back,))
-                posts = cursor.fetchall()
-                logger.info(f"从X数据库查询到 {len(posts)} 个帖子")
-
-            # 批量检查已处理的帖子ID
-            if not posts:
-                return []
-
-            post_ids = [str(post['id']) for post in posts]
-            logger.info(f"批量检查 {len(post_ids)} 个帖子的处理状态...")
-            processed_ids = self.learning_db.get_processed_post_ids('X', post_ids)
-            logger.info(f"其中 {len(processed_ids)} 个已处理")
-
-            # 过滤掉已处理的帖子
-            unprocessed = []
-            for post in posts:
-                post_id = str(post['id'])
-                if post_id not in processed_ids:
-                    unprocessed.append({
-                        'source_post_id': post_id,
+                self._check_indexes(conn, 'X')
+                # 截止时间在客户端算好后作为常量传入,便于优化器对 created_at 做范围扫描
+                cutoff = datetime.now() - timedelta(days=days_back)
+                rows = self._iter_unprocessed_rows(conn, self._SQL_X_POSTS, cutoff, 'X', self.x_config)
+
+                # 按SQL列顺序直接解包元组行,不必为每行构建字典
+                unprocessed = [
+                    {
+                        'source_post_id': pid,
                         'source_platform': 'X',
-                        'original_content': post['post_content'] or '',
-                        'original_url': post['post_url'],
-                        'author_name': post['user_id'],
-                        'published_at': post['published_at'],
-                        'media_urls': post.get('media_urls'),
-                        'summary': post.get('summary'),
-                        'tag': post.get('tag'),
-                        'content_type': post.get('content_type'),
-                        'interpretation': post.get('interpretation')
-                    })
+                        'original_content': post_content or '',
+                        'original_url': post_url,
+                        'author_name': user_id,
+                        'published_at': published_at,
+                        'media_urls': media_urls,
+                        'summary': summary,
+                        'tag': tag,
+                        'content_type': content_type
+                    }
+                    for (pid, post_url, post_content, published_at, media_urls, user_id,
+                         summary, tag, content_type, _created_at, _key_id) in rows
+                ]
+                self._attach_interpretations('X', unprocessed, conn)
 
             logger.info(f"从X数据库获取到 {len(unprocessed)} 个未处理的帖子")
             return unprocessed
@@ -166,63 +391,27 @@ class SourceReader:
         try:
             logger.info(f"开始从即刻数据库查询最近 {days_back} 天的帖子...")
 
+            # 帖子分页查询和图片解读查询复用同一个连接
             with self._get_jike_connection() as conn:
-                cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-                # 查询 jk_posts 和 postprocessing 表
-                sql = """
-                SELECT
-                    p.id,
-                    p.link,
-                    p.title,
-                    p.summary,
-                    p.published_at,
-                    prof.nickname,
-                    prof.jike_user_id,
-                    pp.interpretation_text
-                FROM jk_posts p
-                JOIN jk_profiles prof ON p.profile_id = prof.id
-                LEFT JOIN postprocessing pp ON p.id = pp.post_id AND pp.status = 'success'
-                WHERE p.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                ORDER BY p.published_at DESC
-                LIMIT 1000
-                """
-
-                cursor.execute(sql, (days_back,))
-                posts = cursor.fetchall()
-                logger.info(f"从即刻数据库查询到 {len(posts)} 个帖子")
-
-            # 批量检查已处理的帖子ID
-            if not posts:
-                return []
-
-            post_ids = [str(post['id']) for post in posts]
-            logger.info(f"批量检查 {len(post_ids)} 个帖子的处理状态...")
-            processed_ids = self.learning_db.get_processed_post_ids('Jike', post_ids)
-            logger.info(f"其中 {len(processed_ids)} 个已处理")
-
-            # 过滤掉已处理的帖子
-            unprocessed = []
-            for post in posts:
-                post_id = str(post['id'])
-                if post_id not in processed_ids:
-                    # 组合标题和摘要作为内容
-                    content_parts = []
-                    if post.get('title'):
-                        content_parts.append(post['title'])
-                    if post.get('summary'):
-                        content_parts.append(post['summary'])
-                    original_content = '\n\n'.join(content_parts)
-
-                    unprocessed.append({
-                        'source_post_id': post_id,
+                self._check_indexes(conn, 'Jike')
+                cutoff = datetime.now() - timedelta(days=days_back)
+                rows = self._iter_unprocessed_rows(conn, self._SQL_JIKE_POSTS, cutoff, 'Jike', self.jike_config)
+
+                # 按SQL列顺序直接解包元组行,不必为每行构建字典
+                unprocessed = [
+                    {
+                        'source_post_id': pid,
                         'source_platform': 'Jike',
-                        'original_content': original_content,
-                        'original_url': post['link'],
-                        'author_name': post['nickname'] or post['jike_user_id'],
-                        'published_at': post['published_at'],
-                        'interpretation': post.get('interpretation_text')
-                    })
+                        # 组合标题和摘要作为内容(跳过为空的部分)
+                        'original_content': f"{title}\n\n{summary}" if title and summary else title or summary or '',
+                        'original_url': link,
+                        'author_name': nickname or jike_user_id,
+                        'published_at': published_at
+                    }
+                    for (pid, link, title, summary, published_at, nickname,
+                         jike_user_id, _created_at, _key_id) in rows
+                ]
+                self._attach_interpretations('Jike', unprocessed, conn)
 
             logger.info(f"从即刻数据库获取到 {len(unprocessed)} 个未处理的帖子")
             return unprocessed
@@ -242,25 +431,61 @@ class SourceReader:
         """
         all_posts = []
 
-        # 获取X帖子
-        x_posts = self.get_unprocessed_x_posts(days_back)
+        # X和即刻位于不同的数据库,两边并发查询,总耗时取决于较慢的一边;
+        # 需要分步排除已处理帖子时,同时预热学习库的已处理集合,与源库查询重叠
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            self._submit_preload(executor)
+            x_future = executor.submit(self.get_unprocessed_x_posts, days_back)
+            jike_future = executor.submit(self.get_unprocessed_jike_posts, days_back)
+            x_posts = x_future.result()
+            jike_posts = jike_future.result()
+
+        # X帖子
         all_posts.extend(x_posts)
         logger.info(f"从X获取 {len(x_posts)} 个未处理帖子")
 
-        # 获取即刻帖子
-        jike_posts = self.get_unprocessed_jike_posts(days_back)
+        # 即刻帖子
         all_posts.extend(jike_posts)
         logger.info(f"从即刻获取 {len(jike_posts)} 个未处理帖子")
 
         logger.info(f"总共获取到 {len(all_posts)} 个未处理的帖子")
         return all_posts
 
-    def get_interpretation_by_post_ids(self, platform: str, post_ids: List[str]) -> Dict[str, str]:
+    def _submit_preload(self, executor: ThreadPoolExecutor):
+        """在线程池中按需预热学习库的已处理集合,与源库查询重叠"""
+        executor.submit(self._preload_if_needed)
+
+    def _preload_if_needed(self):
+        """任一平台需要分步排除已处理帖子时,预热学习库的已处理集合
+
+        平台未配置(读取配置出错)时视为无需预热,该平台的错误由各自的查询方法处理
+        """
+        for platform in ('X', 'Jike'):
+            try:
+                db_config = self.x_config if platform == 'X' else self.jike_config
+                needs_lookup = self._needs_processed_lookup(platform, db_config)
+            except Exception as e:
+                logger.debug(f"{platform}数据源配置不可用,跳过预热判断: {e}")
+                continue
+            if needs_lookup:
+                self.learning_db.preload_processed_posts()
+                return
+
+    def _attach_interpretations(self, platform: str, posts: List[Dict[str, Any]], conn=None):
+        """为未处理的帖子补充VLM图片解读(没有解读时为None)"""
+        interpretations = self.get_interpretation_by_post_ids(platform, [post['source_post_id'] for post in posts], conn)
+        for post in posts:
+            post['interpretation'] = interpretations.get(post['source_post_id'])
+
+    def get_interpretation_by_post_ids(self, platform: str, post_ids: List[str], conn=None) -> Dict[str, str]:
         """批量获取帖子的VLM图片解读
 
+        结果(包括没有解读的帖子)按ID缓存 _INTERP_CACHE_TTL 秒,只查询缓存未命中的ID
+
         Args:
             platform: 平台名称 ('X' 或 'Jike')
             post_ids: 帖子ID列表
+            conn: 可选,调用方已持有的该平台源数据库连接,传入时复用它而不再从连接池另取
 
         Returns:
             字典: {post_id: interpretation}
@@ -268,47 +493,70 @@ class SourceReader:
         if not post_ids:
             return {}
 
-        try:
-            if platform == 'X':
-                with self._get_x_connection() as conn:
-                    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-                    placeholders = ','.join(['%s'] * len(post_ids))
-                    sql = f"""
-                    SELECT pi.post_id, pi.interpretation
-                    FROM post_insights pi
-                    WHERE pi.post_id IN ({placeholders})
-                      AND pi.status = 'completed'
-                      AND pi.interpretation IS NOT NULL
-                    """
-
-                    cursor.execute(sql, post_ids)
-                    results = cursor.fetchall()
-
-                    return {str(row['post_id']): row['interpretation'] for row in results}
-
-            elif platform == 'Jike':
-                with self._get_jike_connection() as conn:
-                    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-                    placeholders = ','.join(['%s'] * len(post_ids))
-                    sql = f"""
-                    SELECT pp.post_id, pp.interpretation_text
-                    FROM postprocessing pp
-                    WHERE pp.post_id IN ({placeholders})
-                      AND pp.status = 'success'
-                      AND pp.interpretation_text IS NOT NULL
-                    """
-
-                    cursor.execute(sql, post_ids)
-                    results = cursor.fetchall()
-
-                    return {str(row['post_id']): row['interpretation_text'] for row in results}
+        if platform not in ('X', 'Jike'):
+            logger.warning(f"不支持的平台: {platform}")
+            return {}
 
-            else:
-                logger.warning(f"不支持的平台: {platform}")
-                return {}
+        interpretations = {}
+        misses = []
+        now = time.monotonic()
+        with self._interp_lock:
+            for post_id in post_ids:
+                cached = self._interp_cache.get((platform, post_id))
+                if cached and now - cached[0] < _INTERP_CACHE_TTL:
+                    if cached[1] is not None:
+                        interpretations[post_id] = cached[1]
+                else:
+                    misses.append(post_id)
+
+        if not misses:
+            return interpretations
 
+        try:
+            if conn is not None:
+                fetched = self._fetch_interpretations(conn, platform, misses)
+            else:
+                fetched = self._query_interpretations(platform, misses)
         except Exception as e:
             logger.error(f"批量获取{platform}图片解读失败: {e}", exc_info=True)
-            return {}
+            return interpretations
+
+        with self._interp_lock:
+            for post_id in misses:
+                # 没有解读的帖子也缓存(值为None),避免重复查询
+                self._interp_cache.pop((platform, post_id), None)
+                self._interp_cache[(platform, post_id)] = (now, fetched.get(post_id))
+            # 超出上限时按插入顺序淘汰最早的条目
+            while len(self._interp_cache) > _INTERP_CACHE_MAX:
+                del self._interp_cache[next(iter(self._interp_cache))]
+
+        interpretations.update(fetched)
+        return interpretations
+
+    def _query_interpretations(self, platform: str, post_ids: List[str]) -> Dict[str, str]:
+        """从连接池取一个源数据库连接查询VLM图片解读,出错时抛出异常"""
+        get_connection = self._get_x_connection if platform == 'X' else self._get_jike_connection
+        with get_connection() as conn:
+            return self._fetch_interpretations(conn, platform, post_ids)
+
+    def _fetch_interpretations(self, conn, platform: str, post_ids: List[str]) -> Dict[str, str]:
+        """在给定的源数据库连接上查询帖子的VLM图片解读,出错时抛出异常
+
+        ID按 _IN_QUERY_CHUNK_SIZE 分批查询,避免单条SQL过长
+        """
+        if platform == 'X':
+            column = 'interpretation'
+            sql_template = self._SQL_INTERP_X_TMPL
+        else:
+            column = 'interpretation_text'
+            sql_template = self._SQL_INTERP_JIKE_TMPL
+
+        interpretations = {}
+        cursor = conn.cursor()
+        for start in range(0, len(post_ids), _IN_QUERY_CHUNK_SIZE):
+            chunk = post_ids[start:start + _IN_QUERY_CHUNK_SIZE]
+            placeholders = ','.join(('%s',) * len(chunk))
+            cursor.execute(sql_template.format(placeholders=placeholders), chunk)
+            interpretations.update({row['post_id']: row[column] for row in cursor.fetchall()})
+
+        return interpretations